@@ -0,0 +1,123 @@
+"""Whole-crawl throughput against a local stand-in cache server.
+
+Crawls a corpus served by benchmarks.cache_server once per THREADCOUNT and
+reports pages/sec, CPU time per page and peak memory. The server runs in its
+own process and every crawl in a fresh one, in a temporary directory, so
+runs don't share state or skew each other's CPU numbers. Settings come from
+config.ini, override them with --set.
+
+Run from the repository root:
+    python -m benchmarks.bench_crawl --threads 1,4,16
+    python -m benchmarks.bench_crawl --threads 4 --set "LOCAL PROPERTIES.MAXINFLIGHT=8"
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+
+from benchmarks.cache_server import add_corpus_arguments, make_corpus, serve
+
+
+def crawl(config_file, overrides, port, results):
+    # Runs in its own process, puts (pages, seconds, cpu seconds, max rss
+    # in KiB) on results.
+    config_file = os.path.abspath(config_file)
+    os.chdir(tempfile.mkdtemp(prefix="bench_crawl_"))
+    sys.stdout = sys.stderr = open(os.devnull, "w")
+    from crawler import Crawler
+    from crawler.async_worker import AsyncWorker
+    from crawler.metrics import metrics
+    from crawler.worker import Worker
+    from utils.config import Config
+    from utils.log import configure_logging
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    for (section, key), value in overrides.items():
+        cparser[section][key] = value
+    config = Config(cparser)
+    config.cache_server = ("127.0.0.1", port)
+    configure_logging(config)
+    worker_factory = AsyncWorker if config.max_in_flight > 0 else Worker
+    start = time.perf_counter()
+    Crawler(config, True, worker_factory=worker_factory).start()
+    seconds = time.perf_counter() - start
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    results.put((
+        metrics.count("pages_downloaded"), seconds, cpu,
+        max(own.ru_maxrss, children.ru_maxrss)))
+
+
+def parse_overrides(pairs):
+    overrides = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        section, _, key = name.rpartition(".")
+        overrides[(section, key)] = value
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_corpus_arguments(parser)
+    parser.add_argument("--threads", default="1,2,4,8",
+                        help="comma separated THREADCOUNT values")
+    parser.add_argument("--politeness", type=float, default=0.01,
+                        help="POLITENESS for the runs, in seconds")
+    parser.add_argument("--config_file", default="config.ini")
+    parser.add_argument("--set", action="append", default=[],
+                        metavar="SECTION.KEY=VALUE",
+                        help="override a config.ini setting")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    corpus = make_corpus(args)
+    ready = context.Queue()
+    server = context.Process(
+        target=serve, args=(corpus, 0, args.latency, args.jitter, ready),
+        daemon=True)
+    server.start()
+    port = ready.get()
+
+    overrides = {
+        ("CRAWLER", "SEEDURL"): ",".join(corpus.seeds()),
+        ("CRAWLER", "POLITENESS"): str(args.politeness),
+        # One process, so the numbers are for the whole crawl.
+        ("LOCAL PROPERTIES", "SHARDS"): "1",
+        ("LOCAL PROPERTIES", "METRICSPORT"): "0",
+        ("LOCAL PROPERTIES", "METRICSINTERVAL"): "0"}
+    overrides.update(parse_overrides(args.set))
+    print(f"{'threads':>7} {'pages':>7} {'seconds':>8} {'pages/s':>8} "
+          f"{'cpu ms/page':>11} {'max rss MB':>10}")
+    try:
+        for threads in [int(t) for t in args.threads.split(",")]:
+            overrides[("LOCAL PROPERTIES", "THREADCOUNT")] = str(threads)
+            results = context.Queue()
+            run = context.Process(
+                target=crawl,
+                args=(args.config_file, overrides, port, results))
+            run.start()
+            while True:
+                try:
+                    pages, seconds, cpu, rss = results.get(timeout=1)
+                    break
+                except queue.Empty:
+                    if run.exitcode is not None:
+                        raise RuntimeError(
+                            f"Crawl with {threads} threads failed.")
+            run.join()
+            print(f"{threads:>7} {pages:>7} {seconds:>8.2f} "
+                  f"{pages / seconds:>8.1f} {1000 * cpu / max(pages, 1):>11.2f} "
+                  f"{rss / 1024:>10.1f}")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Per-page parse cost: two BeautifulSoup passes vs one streaming lxml pass.
+
+Run from the repository root:
+    python -m benchmarks.bench_parse
+"""
+import random
+import re
+import time
+from urllib.parse import urldefrag, urljoin
+from bs4 import BeautifulSoup
+from utils.page import parse_page, stop_words
+
+PAGES = 50
+URL = "https://www.ics.uci.edu/community/news/"
+
+
+def synthetic_page(paragraphs=200, links_per_paragraph=3):
+    # Non-ASCII words and no <meta> charset, so the UTF-8 page only parses
+    # the same as BeautifulSoup if it is not read as Latin-1.
+    words = ["research", "student", "computer", "science", "data", "the", "of", "learning",
+             "research\u2014learning", "caf\u00e9", "na\u00efve", "\u201cdata\u201d"]
+    body = []
+    for p in range(paragraphs):
+        text = " ".join(random.choices(words, k=40))
+        anchors = "".join(
+            f'<a href="/page/{p}/{i}#top">link {i}</a> ' for i in range(links_per_paragraph))
+        body.append(f"<div><p>{text}</p>\n{anchors}</div>\n")
+    return (
+        "<html><head><title>News</title><style>p {color: red}</style>"
+        "<script>var x = 1;</script></head><body>\n"
+        + "".join(body) + "</body></html>").encode("utf-8")
+
+
+def legacy(content, url):
+    text = BeautifulSoup(content, 'lxml').get_text()
+    words = [w for w in re.findall(r'\b[a-zA-Z]{2,}\b', text.lower()) if w not in stop_words]
+    links = set()
+    for atag in BeautifulSoup(content, 'lxml').find_all('a'):
+        href = atag.get('href')
+        if href:
+            links.add(urljoin(url, urldefrag(href)[0]))
+    return words, links
+
+
+def main():
+    random.seed(0)
+    pages = [synthetic_page() for _ in range(PAGES)]
+    start = time.perf_counter()
+    legacy_results = [legacy(page, URL) for page in pages]
+    legacy_ms = (time.perf_counter() - start) / PAGES * 1e3
+    start = time.perf_counter()
+    results = [parse_page(page, URL) for page in pages]
+    single_ms = (time.perf_counter() - start) / PAGES * 1e3
+    for (words, links), page in zip(legacy_results, results):
+        assert words == page.words and links == set(page.links)
+    assert parse_page("<p>research\u2014learning and data science</p>".encode("utf-8"), URL).words == [
+        "research", "learning", "data", "science"]
+    print(f"two BeautifulSoup parses: {legacy_ms:7.2f} ms/page")
+    print(f"one streaming parse:      {single_ms:7.2f} ms/page ({legacy_ms / single_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
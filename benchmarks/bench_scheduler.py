@@ -0,0 +1,35 @@
+"""Dispatch cost of the frontier scheduler as the number of hosts grows.
+
+Run from the repository root:
+    python -m benchmarks.bench_scheduler
+"""
+import time
+from crawler.scheduler import HostScheduler
+
+HOST_COUNTS = [10, 100, 1000, 10000, 100000]
+URLS_PER_HOST = 3
+DISPATCHES = 100000
+
+
+def bench(host_count):
+    scheduler = HostScheduler(time_delay=0)
+    for i in range(URLS_PER_HOST):
+        for host in range(host_count):
+            scheduler.push(f"h{host}.ics.uci.edu", f"https://h{host}.ics.uci.edu/{i}")
+    dispatches = min(DISPATCHES, len(scheduler))
+    start = time.perf_counter()
+    for _ in range(dispatches):
+        url, _ = scheduler.pop()
+        assert url is not None
+    elapsed = time.perf_counter() - start
+    return elapsed / dispatches * 1e6
+
+
+def main():
+    print(f"{'hosts':>8} {'us/dispatch':>12}")
+    for host_count in HOST_COUNTS:
+        print(f"{host_count:>8} {bench(host_count):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Near-duplicate lookup cost of Stats.check_and_add at up to 1M fingerprints.
+
+Run from the repository root:
+    python -m benchmarks.bench_simhash_index
+"""
+import random
+import time
+from crawler.stats import Stats
+
+SIZES = [10000, 100000, 1000000]
+QUERIES = 20000
+
+
+def flip_bits(fingerprint, count):
+    for bit in random.sample(range(64), count):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def linear_scan(fingerprints, simhash, threshold=3):
+    for existing in fingerprints:
+        if bin(simhash ^ existing).count("1") <= threshold:
+            return True
+    return False
+
+
+def main():
+    random.seed(0)
+    print(f"{'stored':>8} {'us/check_and_add':>17} {'near hits':>10} {'us/linear scan':>15}")
+    for size in SIZES:
+        stats = Stats()
+        fingerprints = [random.getrandbits(64) for _ in range(size)]
+        for fingerprint in fingerprints:
+            stats.add_simhash(fingerprint)
+        # Half the queries are within 3 bits of a stored page, half are new.
+        queries = [
+            flip_bits(random.choice(fingerprints), random.randint(0, 3))
+            if i % 2 else random.getrandbits(64)
+            for i in range(QUERIES)]
+        start = time.perf_counter()
+        hits = sum(stats.check_and_add(query) for query in queries)
+        indexed = (time.perf_counter() - start) / QUERIES * 1e6
+        scan_queries = queries[:max(1, QUERIES * 10000 // size // 10)]
+        start = time.perf_counter()
+        for query in scan_queries:
+            linear_scan(fingerprints, query)
+        linear = (time.perf_counter() - start) / len(scan_queries) * 1e6
+        print(f"{size:>8} {indexed:>17.2f} {hits:>10} {linear:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Per-url cost of scraper.is_valid on a synthetic million-url corpus,
+checked against the previous hand-written rule chain.
+
+Run from the repository root:
+    python -m benchmarks.bench_url_filter
+"""
+import random
+import re
+import time
+from urllib.parse import urlparse
+from scraper import is_valid
+
+CORPUS_SIZE = 1000000
+
+
+def legacy_is_valid(url):
+    parsed = urlparse(url)
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    domain = parsed.netloc.lower()
+    path = parsed.path.lower()
+    if not (
+        domain.endswith(".ics.uci.edu") or domain == "ics.uci.edu" or
+        domain.endswith(".cs.uci.edu") or domain == "cs.uci.edu" or
+        domain.endswith(".informatics.uci.edu") or domain == "informatics.uci.edu" or
+        domain.endswith(".stat.uci.edu") or domain == "stat.uci.edu" or
+        (domain == "today.uci.edu" and path.startswith("/department/information_computer_sciences"))
+    ):
+        return False
+    if any(param in parsed.query for param in ["do=login", "do=revisions", "do=edit", "do=media", "image=", "ical=1", "outlook-ical=1", "tribe-bar-date", "redirect", "share=", "filter", "action=download", "action=login", "idx=", "version=", "precision=", "rev="]):
+        return False
+    if any(param in parsed.path for param in ["/-/commit", "/-/blob", "/-/blame", "/-/tree", "/-/branches", "/-/forks", "/-/merge_requests", "~eppstein/pix/", "/zip-attachment/", "/attachment/", "/-/tags/"]):
+        return False
+    if re.match(
+        r".*\.(css|js|bmp|gif|jpe?g|ico|grm|psp|git"
+        + r"|png|tiff?|mid|mp2|mp3|mp4|mpg|scm|bib|h"
+        + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+        + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+        + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+        + r"|epub|dll|cnf|tgz|sha1|txt|py|ff|cpp|md|cp"
+        + r"|thmx|mso|arff|rtf|jar|csv|ppsx|java|patch"
+        + r"|rm|smil|wmv|swf|wma|zip|rar|gz|apk|war|img|sql)$", parsed.path.lower()):
+        return False
+    if len(url) > 1000:
+        return False
+    segment_counts = {}
+    for segment in parsed.path.split('/'):
+        segment_counts[segment] = segment_counts.get(segment, 0) + 1
+        if segment_counts[segment] >= 3:
+            return False
+    return True
+
+
+def synthetic_corpus(size):
+    hosts = [
+        "www.ics.uci.edu", "ics.uci.edu", "vision.ics.uci.edu", "www.cs.uci.edu",
+        "www.informatics.uci.edu", "www.stat.uci.edu", "today.uci.edu",
+        "www.uci.edu", "evilics.uci.edu", "www.google.com", "WWW.ICS.UCI.EDU"]
+    segments = ["people", "research", "news", "2019", "a", "-", "~eppstein",
+                "pix", "department", "information_computer_sciences", "events"]
+    endings = ["", "/", ".html", ".pdf", ".PDF", ".tar.gz", ".jpeg", ".php", ".txt"]
+    queries = ["", "", "", "page=2", "do=edit", "ical=1", "id=5&filter=x", "tribe-bar-date=2020"]
+    schemes = ["https", "https", "http", "ftp", "mailto"]
+    corpus = []
+    for _ in range(size):
+        path = "/".join(random.choices(segments, k=random.randint(0, 5)))
+        url = (f"{random.choice(schemes)}://{random.choice(hosts)}/{path}"
+               f"{random.choice(endings)}")
+        query = random.choice(queries)
+        if query:
+            url += "?" + query
+        if random.random() < 0.001:
+            url += "x" * 1000
+        corpus.append(url)
+    return corpus
+
+
+def main():
+    random.seed(0)
+    corpus = synthetic_corpus(CORPUS_SIZE)
+    start = time.perf_counter()
+    legacy = [legacy_is_valid(url) for url in corpus]
+    legacy_us = (time.perf_counter() - start) / CORPUS_SIZE * 1e6
+    start = time.perf_counter()
+    compiled = [is_valid(url) for url in corpus]
+    compiled_us = (time.perf_counter() - start) / CORPUS_SIZE * 1e6
+    mismatches = [url for url, a, b in zip(corpus, legacy, compiled) if a != b]
+    assert not mismatches, mismatches[:10]
+    print(f"{CORPUS_SIZE} urls, {sum(compiled)} accepted")
+    print(f"rule chain:     {legacy_us:6.2f} us/url")
+    print(f"compiled rules: {compiled_us:6.2f} us/url ({legacy_us / compiled_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Local stand-in for the spacetime cache server.
+
+Serves the same CBOR encoded responses as the real cache, for pages of a
+synthetic corpus generated on the fly or of a corpus recorded to a file, with
+a configurable response latency. Used by benchmarks.bench_crawl, or on its
+own from the repository root:
+    python -m benchmarks.cache_server --port 9000 --pages 5000
+"""
+import argparse
+import math
+import pickle
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cbor
+import requests
+
+DOMAINS = ["ics.uci.edu", "cs.uci.edu", "informatics.uci.edu", "stat.uci.edu"]
+PAGE_PATH = re.compile(r"^/pages/(\d+)\.html$")
+
+
+class SyntheticCorpus(object):
+    # pages pages spread round robin over hosts hosts. Every page links to
+    # links others, a share locality of them on its own host, and has about
+    # words words (log-normally distributed) drawn from a Zipf vocabulary.
+    # A share duplicates of the pages are byte for byte copies of an earlier
+    # page. Pages are generated from their index, nothing is stored.
+    def __init__(self, pages=2000, hosts=20, links=10, words=400,
+                 locality=0.8, duplicates=0.05, vocabulary=5000, seed=1):
+        self.pages = pages
+        self.hosts = [
+            f"host{i}.{DOMAINS[i % len(DOMAINS)]}" for i in range(hosts)]
+        self.links = links
+        self.words = words
+        self.locality = locality
+        self.duplicates = duplicates
+        self.seed = seed
+        rng = random.Random(seed)
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        self.vocabulary = [
+            "".join(rng.choices(letters, k=rng.randint(3, 10)))
+            for _ in range(vocabulary)]
+        total = 0
+        self.cumulative = []
+        for rank in range(1, vocabulary + 1):
+            total += 1 / rank
+            self.cumulative.append(total)
+
+    def url(self, index):
+        host = self.hosts[index % len(self.hosts)]
+        return f"https://{host}/pages/{index}.html"
+
+    def seeds(self):
+        return [self.url(i) for i in range(min(len(self.hosts), self.pages))]
+
+    def urls(self):
+        return (self.url(i) for i in range(self.pages))
+
+    def get(self, url):
+        # Returns (status, html bytes or None).
+        parsed = urlparse(url)
+        match = PAGE_PATH.match(parsed.path)
+        if not match or int(match.group(1)) >= self.pages:
+            return 404, None
+        index = int(match.group(1))
+        if self.url(index) != url.split("#")[0]:
+            return 404, None
+        return 200, self.content(index)
+
+    def content(self, index):
+        rng = random.Random(self.seed * 1000003 + index)
+        if index and rng.random() < self.duplicates:
+            return self.content(rng.randrange(index))
+        host_count = len(self.hosts)
+        targets = []
+        for _ in range(self.links):
+            target = rng.randrange(self.pages)
+            if rng.random() < self.locality:
+                target += index % host_count - target % host_count
+                if target >= self.pages:
+                    target -= host_count
+            targets.append(target)
+        count = max(1, int(rng.lognormvariate(math.log(self.words), 0.5)))
+        text = " ".join(rng.choices(
+            self.vocabulary, cum_weights=self.cumulative, k=count))
+        anchors = "".join(
+            f'<li><a href="{self.url(target)}">page {target}</a></li>'
+            for target in targets if target >= 0)
+        return (
+            f"<html><head><title>Page {index}</title></head><body>"
+            f"<p>{text}</p><ul>{anchors}</ul></body></html>").encode("utf-8")
+
+
+class RecordedCorpus(object):
+    # Corpus saved with record(), a CBOR map with the seed urls and a map of
+    # url -> [status, content].
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            recorded = cbor.load(f)
+        self.seed_urls = recorded["seeds"]
+        self.pages = recorded["pages"]
+
+    def seeds(self):
+        return self.seed_urls
+
+    def urls(self):
+        return iter(self.pages)
+
+    def get(self, url):
+        status, content = self.pages.get(url.split("#")[0], (404, None))
+        return status, content
+
+
+def record(corpus, path):
+    with open(path, "wb") as f:
+        cbor.dump({
+            "seeds": corpus.seeds(),
+            "pages": {url: list(corpus.get(url)) for url in corpus.urls()}}, f)
+
+
+def encode(url, status, content):
+    # What the cache server sends: a CBOR map with the pickled
+    # requests.Response under "response".
+    if content is None:
+        return cbor.dumps({"url": url, "status": status})
+    resp = requests.Response()
+    resp.status_code = status
+    resp.url = url
+    resp.headers["Content-Type"] = "text/html; charset=utf-8"
+    resp._content = content
+    return cbor.dumps(
+        {"url": url, "status": status, "response": pickle.dumps(resp)})
+
+
+class CacheServer(object):
+    # Serves corpus on 127.0.0.1:port (0 picks a free port) in a background
+    # thread. Every response is delayed by latency plus up to jitter seconds.
+    def __init__(self, corpus, port=0, latency=0.0, jitter=0.0):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes, with Nagle on the
+            # body waits for the client's delayed ACK on a kept-alive
+            # connection.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                url = query.get("q", [""])[0]
+                status, content = corpus.get(url)
+                body = encode(url, status, content)
+                if latency or jitter:
+                    time.sleep(latency + random.random() * jitter)
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def serve(corpus, port, latency, jitter, ready):
+    # multiprocessing target, puts the port on ready and serves forever.
+    server = CacheServer(corpus, port, latency, jitter)
+    ready.put(server.port)
+    server.server.serve_forever()
+
+
+def add_corpus_arguments(parser):
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--links", type=int, default=10)
+    parser.add_argument("--words", type=int, default=400,
+                        help="median words per page")
+    parser.add_argument("--locality", type=float, default=0.8,
+                        help="share of links to the same host")
+    parser.add_argument("--duplicates", type=float, default=0.05,
+                        help="share of pages that copy another page")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--corpus", help="recorded corpus file to serve "
+                        "instead of a synthetic one")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.01,
+                        help="up to this many more seconds, at random")
+
+
+def make_corpus(args):
+    if args.corpus:
+        return RecordedCorpus(args.corpus)
+    return SyntheticCorpus(
+        args.pages, args.hosts, args.links, args.words, args.locality,
+        args.duplicates, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_corpus_arguments(parser)
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--record", metavar="PATH",
+                        help="write the synthetic corpus to PATH and exit")
+    args = parser.parse_args()
+    corpus = make_corpus(args)
+    if args.record:
+        record(corpus, args.record)
+        return
+    server = CacheServer(corpus, args.port, args.latency, args.jitter)
+    print(f"Serving on 127.0.0.1:{server.port}, seeds: {','.join(corpus.seeds())}")
+    server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
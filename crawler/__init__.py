@@ -1,23 +1,56 @@
+import os
 from utils import get_logger
 from crawler.frontier import Frontier
 from crawler.worker import Worker
 from crawler.stats import Stats
+from crawler.parse_pool import ParsePool
+from crawler.metrics import MetricsServer, MetricsReporter
 
 class Crawler(object):
-    def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
+    def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker,
+                 stats_factory=Stats):
         self.config = config
         self.logger = get_logger("CRAWLER")
         self.frontier = frontier_factory(config, restart)
-        self.stats = Stats()
+        self.stats = stats_factory(
+            checkpoints=bool(config.stats_file), sketch=config.word_sketch)
+        if config.stats_file:
+            if restart and os.path.exists(config.stats_file):
+                os.remove(config.stats_file)
+            elif os.path.exists(config.stats_file):
+                self.logger.info(
+                    f"Loading statistics from {config.stats_file}.")
+                self.stats.load_checkpoint(config.stats_file)
+            # Checkpointed with the frontier, so every page saved as done
+            # has its statistics on disk.
+            self.frontier.before_save(
+                lambda: self.stats.checkpoint(config.stats_file))
         self.workers = list()
         self.worker_factory = worker_factory
+        self.parse_pool = None
+        if config.parse_processes > 0:
+            self.parse_pool = ParsePool(
+                config.parse_processes, config.parse_queue)
+        self.metrics_server = None
+        if config.metrics_port:
+            self.metrics_server = MetricsServer(config.metrics_port)
+        self.metrics_reporter = None
+        if config.metrics_interval > 0:
+            self.metrics_reporter = MetricsReporter(
+                self.logger, config.metrics_interval)
 
     def start_async(self):
         self.workers = [
-            self.worker_factory(worker_id, self.config, self.frontier, self.stats)
+            self.worker_factory(
+                worker_id, self.config, self.frontier, self.stats,
+                parse_pool=self.parse_pool)
             for worker_id in range(self.config.threads_count)]
         for worker in self.workers:
             worker.start()
+        if self.metrics_server:
+            self.metrics_server.start()
+        if self.metrics_reporter:
+            self.metrics_reporter.start()
 
     def start(self):
         self.start_async()
@@ -26,19 +59,29 @@ class Crawler(object):
     def join(self):
         for worker in self.workers:
             worker.join()
+        self.frontier.close()
+        if self.parse_pool:
+            self.parse_pool.shutdown()
+        if self.metrics_reporter:
+            self.metrics_reporter.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
         self.output_stats()
 
     def output_stats(self):
-        longest_page, longest_page_words = self.stats.get_longest_page()
-        top_50 = self.stats.get_top_50()
-        subdomains = self.stats.get_subdomains()
-        
-        with open('stats.txt', 'w') as f:
-            f.write(f"Number of unique pages: {self.stats.get_unique_pages()}\n\n"
-                f"Longest page: {longest_page} ({longest_page_words} words)\n\n"
-                "50 most common words:\n")
-            for word, count in top_50:
-                f.write(f"  {word}: {count}\n")
-            f.write("\nSubdomains under uci.edu:\n")
-            for subdomain, count in subdomains:
-                f.write(f"  {subdomain}, {count}\n")
\ No newline at end of file
+        write_stats(self.stats)
+
+def write_stats(stats, filename='stats.txt'):
+    longest_page, longest_page_words = stats.get_longest_page()
+    top_50 = stats.get_top_50()
+    subdomains = stats.get_subdomains()
+    
+    with open(filename, 'w') as f:
+        f.write(f"Number of unique pages: {stats.get_unique_pages()}\n\n"
+            f"Longest page: {longest_page} ({longest_page_words} words)\n\n"
+            "50 most common words:\n")
+        for word, count in top_50:
+            f.write(f"  {word}: {count}\n")
+        f.write("\nSubdomains under uci.edu:\n")
+        for subdomain, count in subdomains:
+            f.write(f"  {subdomain}, {count}\n")
\ No newline at end of file
@@ -0,0 +1,69 @@
+import asyncio
+import time
+from crawler.metrics import metrics
+from crawler.worker import Worker
+from utils.async_download import AsyncCacheClient
+
+class AsyncWorker(Worker):
+    # worker_factory for Crawler that runs one asyncio loop per thread with
+    # up to config.max_in_flight downloads at a time over pooled keep-alive
+    # connections. Urls still come from the Frontier, so per-host politeness
+    # is the same as with Worker. Pages are processed in the loop's default
+    # executor so parsing doesn't stall the downloads.
+    POLL_INTERVAL = 0.1
+
+    def run(self):
+        asyncio.run(self.crawl())
+        self.logger.info("Frontier is empty. Stopping Crawler.")
+
+    async def crawl(self):
+        host, port = self.config.cache_server
+        self.client = AsyncCacheClient(
+            host, port, self.config.max_in_flight,
+            self.config.download_timeout or None)
+        self.active = 0
+        try:
+            await asyncio.gather(
+                *(self.fetch_loop() for _ in range(self.config.max_in_flight)))
+        finally:
+            await self.client.close()
+
+    async def fetch_loop(self):
+        loop = asyncio.get_running_loop()
+        waiting = time.perf_counter()
+        while True:
+            tbd_url, wait_time = self.frontier.try_get_tbd_url()
+            if tbd_url is None:
+                # Other fetches of this worker may still add urls.
+                if wait_time is None and self.active == 0:
+                    break
+                await asyncio.sleep(min(wait_time or self.POLL_INTERVAL, self.POLL_INTERVAL))
+                continue
+            metrics.observe("frontier_wait", time.perf_counter() - waiting)
+            self.active += 1
+            try:
+                start = time.perf_counter()
+                try:
+                    resp = await self.client.download(tbd_url, self.config, self.logger)
+                except Exception as e:
+                    # Timeouts, connection errors and malformed responses
+                    # only cost this url, not the whole loop.
+                    self.logger.error(f"Failed to download {tbd_url}: {e!r}")
+                    self.frontier.record_response(
+                        tbd_url, None, time.perf_counter() - start)
+                    self.frontier.mark_url_complete(tbd_url)
+                    continue
+                elapsed = time.perf_counter() - start
+                metrics.observe("download", elapsed)
+                metrics.inc("pages_downloaded")
+                self.frontier.record_response(tbd_url, resp, elapsed)
+                self.logger.info(
+                    "Downloaded %s, status <%s>, using cache %s.",
+                    tbd_url, resp.status, self.config.cache_server)
+                try:
+                    await loop.run_in_executor(None, self.process, tbd_url, resp)
+                except Exception as e:
+                    self.logger.error(f"Failed to process {tbd_url}: {e!r}")
+            finally:
+                self.active -= 1
+                waiting = time.perf_counter()
@@ -0,0 +1,75 @@
+import threading
+from collections import Counter
+
+class ShardedCounter(object):
+    # Counter that threads can update without sharing a lock. Every thread
+    # counts into its own Counter shard, guarded by a per-shard lock that is
+    # only contended when a reader folds the shards. Shards are folded into
+    # the total when they grow past fold_size and whenever the counter is
+    # read.
+    def __init__(self, fold_size=50000, track_delta=False):
+        self.fold_size = fold_size
+        # Counts added since the last take_delta, only kept when asked for.
+        self.delta = Counter() if track_delta else None
+        self.local = threading.local()
+        self.shards = []
+        self.total = Counter()
+        self.lock = threading.Lock()
+        self.top = None
+
+    def update(self, counts):
+        lock, shard = self._get_shard()
+        with lock:
+            shard.update(counts)
+            full = len(shard) >= self.fold_size
+        if full:
+            with self.lock:
+                self._fold(lock, shard)
+
+    def fold(self):
+        with self.lock:
+            for lock, shard in self.shards:
+                self._fold(lock, shard)
+
+    def take_delta(self):
+        if self.delta is None:
+            return Counter()
+        self.fold()
+        with self.lock:
+            delta, self.delta = self.delta, Counter()
+            return delta
+
+    def most_common(self, n):
+        # heapq.nlargest over the vocabulary, not a full sort, and cached
+        # until new counts are folded in.
+        self.fold()
+        with self.lock:
+            if self.top is None or len(self.top) < n:
+                self.top = self.total.most_common(n)
+            return self.top[:n]
+
+    def items(self):
+        self.fold()
+        with self.lock:
+            return list(self.total.items())
+
+    def _get_shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = (threading.Lock(), Counter())
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def _fold(self, lock, shard):
+        # Caller holds self.lock.
+        with lock:
+            if shard:
+                self._add(shard)
+                if self.delta is not None:
+                    self.delta.update(shard)
+                shard.clear()
+                self.top = None
+
+    def _add(self, counts):
+        self.total.update(counts)
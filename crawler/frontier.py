@@ -1,103 +1,257 @@
 import os
-import shelve
 import threading
 import time
 from utils import get_logger, get_urlhash, normalize
 from scraper import is_valid
+from crawler.scheduler import HostScheduler
+from crawler.politeness import PolitenessController, is_error
+from crawler.traps import TrapDetector
+from crawler.scoring import UrlScorer
+from crawler.metrics import metrics
+from crawler.store import FrontierStore
+from crawler.seen import FingerprintSet, url_fingerprint
 from urllib.parse import urldefrag, urlparse
 
 class Frontier(object):
-    def __init__(self, config, restart):
+    # Seconds between snapshots of the seen set while crawling.
+    SEEN_DUMP_INTERVAL = 60.0
+
+    def __init__(self, config, restart, scorer=None):
+        # scorer orders each host's urls, see crawler.scoring.UrlScorer.
+        # Without one (and PRIORITIZE off) hosts are crawled in FIFO order.
         self.logger = get_logger("FRONTIER")
         self.config = config
+        self.scorer = scorer
+        if self.scorer is None and self.config.prioritize:
+            self.scorer = UrlScorer()
+        # Link depth of the urls being processed, and per host
+        # [pages fetched, pages that were new] for the host yield.
+        self.depths = {}
+        self.host_pages = {}
         self.lock = threading.Lock()
         self.condition = threading.Condition(self.lock)
-        self.domain_queues = {}
-        self.last_access_time = {}
+        self.politeness = PolitenessController(
+            self.config.time_delay, self.config.max_time_delay,
+            self.config.latency_factor)
+        self.scheduler = HostScheduler(self.config.time_delay, self.politeness)
+        self.traps = None
+        if self.config.trap_max_urls:
+            self.traps = TrapDetector(
+                self.config.trap_max_urls, self.config.trap_param_values,
+                self.config.trap_dup_ratio, self.config.trap_throttle)
+        self.seen = FingerprintSet()
+        self.seen_file = self.config.save_file + ".seen"
         self.save_lock = threading.Lock()  # Added lock for self.save
+        self.dump_lock = threading.Lock()
         
-        if not os.path.exists(self.config.save_file) and not restart:
-            self.logger.info(
-                f"Did not find save file {self.config.save_file}, "
-                f"starting from seed.")
-        elif os.path.exists(self.config.save_file) and restart:
+        if not os.path.exists(self.config.save_file):
+            if not restart:
+                self.logger.info(
+                    f"Did not find save file {self.config.save_file}, "
+                    f"starting from seed.")
+            # Leftovers of a deleted save file must not be applied to the
+            # new one.
+            self._remove_save_file(("-wal", "-shm", ".seen"))
+        elif restart:
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
-        self.save = shelve.open(self.config.save_file)
+            self._remove_save_file(("", "-wal", "-shm", ".seen"))
+        self.save = FrontierStore(
+            self.config.save_file, self.config.save_batch,
+            self.config.save_interval)
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
         else:
+            self._load_seen()
             self._parse_save_file()
             if not self.save:
                 for url in self.config.seed_urls:
                     self.add_url(url)
+        # Hooked up last, a dump taken while the seen set is still being
+        # loaded would claim rows it doesn't hold yet.
+        self.seen_dumped = time.time()
+        self.dumped_rowid = 0
+        self.save.after_flush = self._flushed
+
+    def _remove_save_file(self, suffixes):
+        for suffix in suffixes:
+            if os.path.exists(self.config.save_file + suffix):
+                os.remove(self.config.save_file + suffix)
+
+    def _load_seen(self):
+        # Duplicate checks in add_url only look at this in-memory set, the
+        # save file is read once here and never again. The set is dumped
+        # every SEEN_DUMP_INTERVAL seconds and on close(), along with the
+        # save file's db_id and the last rowid it covers, so only urls
+        # discovered after that (e.g. before a crash) have to be read back
+        # from the save file. A dump of any other save file is ignored and
+        # the set rebuilt.
+        covered_rowid = 0
+        if os.path.exists(self.seen_file):
+            try:
+                seen, tags = FingerprintSet.load(self.seen_file)
+            except ValueError as e:
+                self.logger.info(f"Ignoring {self.seen_file}: {e}")
+                tags = ()
+            if (len(tags) == 2 and tags[0] == self.save.db_id
+                    and tags[1] <= self.save.max_rowid()):
+                self.seen = seen
+                covered_rowid = tags[1]
+        for urlhash in self.save.keys(covered_rowid):
+            self.seen.add(url_fingerprint(urlhash))
 
     def _parse_save_file(self):
+        # Only the pending urls are read, they are already in self.seen so
+        # they go straight to the scheduler.
         total_count = len(self.save)
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.add_url(url)
+        for url, priority, depth in self.save.pending_urls():
+            if is_valid(url):
+                with self.lock:
+                    self.scheduler.push(urlparse(url).netloc, (url, depth), priority)
                 tbd_count += 1
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
+    def try_get_tbd_url(self):
+        # Non-blocking get_tbd_url. Returns (url, None) if a url can be
+        # fetched now, (None, wait_time) if the next one is ready in
+        # wait_time seconds, or (None, None) if the frontier is empty.
+        with self.lock:
+            return self._pop()
+
+    def _pop(self):
+        # scheduler.pop for the url alone, caller holds self.lock.
+        item, wait_time = self.scheduler.pop()
+        if item is None:
+            return None, wait_time
+        url, depth = item
+        self.depths[url] = depth
+        return url, None
+
     def get_tbd_url(self):
         with self.condition:
             while True:
-                earliest_time = None
-                current_time = time.time()
-                for domain in list(self.domain_queues.keys()):
-                    if self.domain_queues[domain]:
-                        last_time = self.last_access_time.get(domain, 0)
-                        wait_time = self.config.time_delay - (current_time - last_time)
-                        if wait_time <= 0:
-                            url = self.domain_queues[domain].pop(0)
-                            self.last_access_time[domain] = time.time()
-                            return url
-                        else:
-                            next_available_time = last_time + self.config.time_delay
-                            if earliest_time is None or next_available_time < earliest_time:
-                                earliest_time = next_available_time
-                if earliest_time is not None:
-                    sleep_time = earliest_time - time.time()
-                    if sleep_time > 0:
-                        self.condition.wait(timeout=sleep_time)
-                    else:
-                        continue
-                else:
-                    if all(not q for q in self.domain_queues.values()):
-                        return None
-                    else:
-                        self.condition.wait()
+                url, wait_time = self._pop()
+                if url is not None:
+                    return url
+                if wait_time is None:
+                    return None
+                self.condition.wait(timeout=wait_time)
     
-    def add_url(self, url):
+    def add_url(self, url, depth=0, anchor=""):
+        # Returns True if the url was new and got queued. depth is the
+        # number of links from a seed, anchor the text of the link to it.
         url, _ = urldefrag(url)
         url = normalize(url)
         urlhash = get_urlhash(url)
-        with self.save_lock:
-            if urlhash in self.save:
-                return
         parsed = urlparse(url)
         domain = parsed.netloc
         with self.condition:
-            if domain not in self.domain_queues:
-                self.domain_queues[domain] = []
-            self.domain_queues[domain].append(url)
+            if not self.seen.add(url_fingerprint(urlhash)):
+                return False
+            if self.traps:
+                admitted, change, template = self.traps.admit(url)
+                if change:
+                    self._log_trap(domain, template, change)
+                if not admitted:
+                    metrics.inc("urls_trap_dropped")
+                    return False
+            priority = 0.0
+            if self.scorer:
+                priority = self.scorer.score(
+                    url, depth, anchor, self._host_yield(domain))
+            schedulable = self.scheduler.push(domain, (url, depth), priority)
             with self.save_lock:
-                self.save[urlhash] = (url, False)
-                self.save.sync()
-            self.condition.notify_all()
+                self.save[urlhash] = (url, False, priority, depth)
+            if schedulable:
+                self.condition.notify()
+        return True
     
+    def record_response(self, url, resp, elapsed):
+        # Feeds a download's outcome to the politeness controller and ends
+        # the host's fetch in flight, a host is never handed out again
+        # before this. It then also waits at least the minimum delay after
+        # the response. resp is None if the download failed.
+        host = urlparse(url).netloc
+        with self.condition:
+            delay = self.politeness.record(
+                host, elapsed, resp is None or is_error(resp))
+            if self.scheduler.release(
+                    host, time.time() + self.config.time_delay):
+                self.condition.notify()
+        metrics.observe("host_delay", delay)
+
+    def depth_of(self, url):
+        # Link depth of a url handed out by get_tbd_url.
+        with self.lock:
+            return self.depths.get(url, 0)
+
+    def record_page(self, url, duplicate):
+        # Tells the host yield and the trap detector whether a fetched page
+        # was a duplicate.
+        host = urlparse(url).netloc
+        with self.lock:
+            pages = self.host_pages.get(host)
+            if pages is None:
+                pages = self.host_pages[host] = [0, 0]
+            pages[0] += 1
+            if not duplicate:
+                pages[1] += 1
+            if self.traps:
+                change, template = self.traps.record_page(url, duplicate)
+                if change:
+                    self._log_trap(host, template, change)
+
+    def _host_yield(self, host):
+        # Share of the host's fetched pages that were new, smoothed so an
+        # unknown host gets 0.5. Caller holds self.lock.
+        fetched, new = self.host_pages.get(host, (0, 0))
+        return (new + 1) / (fetched + 2)
+
+    def _log_trap(self, host, template, state):
+        verb = "Blocking" if state == "block" else "Throttling"
+        self.logger.info(f"{verb} url pattern {host}{template}.")
+
     def mark_url_complete(self, url):
         urlhash = get_urlhash(url)
+        with self.condition:
+            self.depths.pop(url, None)
+            seen = url_fingerprint(urlhash) in self.seen
+            # Normally done by record_response already. A url that failed
+            # before it got there must not keep its host busy for good.
+            if self.scheduler.release(urlparse(url).netloc, 0):
+                self.condition.notify()
         with self.save_lock:
-            if urlhash not in self.save:
+            if not seen:
                 self.logger.error(
                     f"Completed url {url}, but have not seen it before.")
             else:
                 self.save[urlhash] = (url, True)
-                self.save.sync()
+
+    def _flushed(self, max_rowid):
+        if time.time() - self.seen_dumped >= self.SEEN_DUMP_INTERVAL:
+            self._dump_seen(max_rowid)
+
+    def _dump_seen(self, max_rowid):
+        # Every url up to max_rowid was added to the set before it was
+        # saved, so a copy taken afterwards covers them all. Only the copy
+        # is taken under the lock, not the write.
+        with self.dump_lock:
+            if max_rowid < self.dumped_rowid:
+                return
+            with self.lock:
+                seen = self.seen.copy()
+            seen.dump(self.seen_file, self.save.db_id, max_rowid)
+            self.seen_dumped = time.time()
+            self.dumped_rowid = max_rowid
+
+    def before_save(self, callback):
+        # callback runs right before each batch of progress is saved.
+        self.save.before_flush = callback
+
+    def close(self):
+        self._dump_seen(self.save.max_rowid())
+        self.save.close()
@@ -0,0 +1,178 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from crawler.counters import ShardedCounter
+
+# Upper bounds in seconds, from 10us to 30s.
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram(object):
+    # Cumulative-bucket latency histogram in the Prometheus style.
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, the
+        # largest bucket bound if it is in the overflow bucket.
+        counts, _, count = self.snapshot()
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for bound, bucket in zip(self.buckets, counts):
+            seen += bucket
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+class Metrics(object):
+    # Named histograms (seconds) and counters, created on first use. Every
+    # process has its own, see crawler.metrics.metrics. Counters are counted
+    # per thread and summed when they are read.
+    def __init__(self):
+        self.histograms = {}
+        self.counters = ShardedCounter()
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        histogram.observe(seconds)
+
+    def inc(self, name, amount=1):
+        self.counters.update({name: amount})
+
+    def count(self, name):
+        return dict(self.counters.items()).get(name, 0)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    @contextmanager
+    def locked(self, lock, name):
+        # Acquires lock and records how long that took under name.
+        start = time.perf_counter()
+        lock.acquire()
+        self.observe(name, time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def prometheus(self):
+        # The Prometheus text exposition format.
+        lines = []
+        counters = sorted(self.counters.items())
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        for name, value in counters:
+            lines.append(f"# TYPE crawler_{name}_total counter")
+            lines.append(f"crawler_{name}_total {value}")
+        for name, histogram in histograms:
+            counts, total, count = histogram.snapshot()
+            lines.append(f"# TYPE crawler_{name}_seconds histogram")
+            cumulative = 0
+            for bound, bucket in zip(histogram.buckets, counts):
+                cumulative += bucket
+                lines.append(
+                    f'crawler_{name}_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'crawler_{name}_seconds_bucket{{le="+Inf"}} {count}')
+            lines.append(f"crawler_{name}_seconds_sum {total}")
+            lines.append(f"crawler_{name}_seconds_count {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        # One line: counters with their rate, then count, mean and p95 of
+        # every histogram.
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        counters = sorted(self.counters.items())
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        parts = [f"{name}={value} ({value / elapsed:.1f}/s)"
+                 for name, value in counters]
+        for name, histogram in histograms:
+            _, total, count = histogram.snapshot()
+            if count:
+                parts.append(
+                    f"{name}: n={count} mean={1000 * total / count:.2f}ms "
+                    f"p95<={1000 * histogram.quantile(0.95):g}ms")
+        return ", ".join(parts)
+
+metrics = Metrics()
+
+class MetricsServer(object):
+    # Serves metrics.prometheus() at /metrics on localhost:port.
+    def __init__(self, port, registry=metrics):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class MetricsReporter(threading.Thread):
+    # Logs metrics.summary() every interval seconds until stopped, and once
+    # more on stop.
+    def __init__(self, logger, interval, registry=metrics):
+        self.logger = logger
+        self.interval = interval
+        self.registry = registry
+        self.stopped = threading.Event()
+        super().__init__(daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.logger.info(f"Metrics: {self.registry.summary()}")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.logger.info(f"Metrics: {self.registry.summary()}")
@@ -0,0 +1,28 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from utils.page import analyze_page
+
+class ParsePool(object):
+    # Runs utils.page.analyze_page in worker processes so parsing, tokenizing
+    # and simhashing escape the GIL, leaving Worker threads to do the I/O.
+    # At most max_pending pages are handed to the pool at once, further
+    # callers block in analyze until a slot frees up.
+    def __init__(self, processes, max_pending=0):
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"))
+        self.slots = threading.BoundedSemaphore(max_pending or 2 * processes)
+
+    def analyze(self, content, url, encoding=None):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(analyze_page, content, url, encoding)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result()
+
+    def shutdown(self):
+        self.executor.shutdown()
@@ -0,0 +1,38 @@
+class PolitenessController(object):
+    # Per-host delay between fetches, adapted from the responses seen. The
+    # delay follows latency_factor times an exponentially weighted moving
+    # average of the host's response time, doubles for every error in a row
+    # (5xx, 429 or no response at all), and is kept between min_delay, the
+    # configured politeness, and max_delay. Responsive hosts stay at
+    # min_delay. Not thread safe, the Frontier serializes access.
+    ALPHA = 0.3
+    MAX_BACKOFF = 10
+
+    def __init__(self, min_delay, max_delay, latency_factor=1.0):
+        self.min_delay = min_delay
+        self.max_delay = max(max_delay, min_delay)
+        self.latency_factor = latency_factor
+        # host -> [average latency, errors in a row]
+        self.hosts = {}
+
+    def delay(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            return self.min_delay
+        latency, errors = state
+        delay = max(self.latency_factor * latency, self.min_delay)
+        return min(delay * (1 << min(errors, self.MAX_BACKOFF)), self.max_delay)
+
+    def record(self, host, elapsed, error):
+        # Returns the host's new delay.
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = [elapsed, 0]
+        else:
+            state[0] += self.ALPHA * (elapsed - state[0])
+        state[1] = state[1] + 1 if error else 0
+        return self.delay(host)
+
+def is_error(resp):
+    # Responses that mean the host is struggling, rather than a bad url.
+    return not resp.status or 500 <= resp.status < 600 or resp.status == 429
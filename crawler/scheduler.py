@@ -0,0 +1,78 @@
+import heapq
+import itertools
+import time
+
+class HostScheduler(object):
+    # Per-host priority queues plus a min-heap of (next allowed fetch time, host).
+    # A host is in the heap exactly once while it has queued urls and no
+    # fetch in flight, so picking the next politely fetchable url is
+    # O(log hosts) instead of a full scan. A popped host stays busy until
+    # release is called with its response.
+    # Not thread safe, the Frontier serializes access with its own lock.
+    # With a PolitenessController the delay is chosen per host. Within a
+    # host the highest priority item comes first, equal priorities in the
+    # order they were pushed.
+    def __init__(self, time_delay, politeness=None):
+        self.time_delay = time_delay
+        self.politeness = politeness
+        # host -> heap of (-priority, sequence number, item)
+        self.queues = {}
+        self.sequence = itertools.count()
+        self.next_allowed = {}
+        # host -> earliest next fetch as of the pop, for hosts in flight
+        self.busy = {}
+        self.heap = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, host, item, priority=0.0):
+        # Returns True if the host just became schedulable, so the caller
+        # knows a waiting thread may have something new to fetch.
+        queue = self.queues.get(host)
+        if queue is None:
+            queue = self.queues[host] = []
+        heapq.heappush(queue, (-priority, next(self.sequence), item))
+        self.count += 1
+        if len(queue) == 1 and host not in self.busy:
+            heapq.heappush(self.heap, (self.next_allowed.get(host, 0), host))
+            return True
+        return False
+
+    def pop(self, now=None):
+        # Returns (item, None) if an item can be fetched right now,
+        # (None, wait) if the earliest host becomes available in wait seconds,
+        # or (None, None) if nothing is queued. While only busy hosts have
+        # queued items, wait is time_delay, release tells when it is sooner.
+        if not self.heap:
+            return None, (self.time_delay if self.count else None)
+        if now is None:
+            now = time.time()
+        ready_time, host = self.heap[0]
+        if ready_time > now:
+            return None, ready_time - now
+        heapq.heappop(self.heap)
+        queue = self.queues[host]
+        item = heapq.heappop(queue)[2]
+        self.count -= 1
+        if not queue:
+            del self.queues[host]
+        if self.politeness:
+            self.busy[host] = now + self.politeness.delay(host)
+        else:
+            self.busy[host] = now + self.time_delay
+        return item, None
+
+    def release(self, host, ready_time):
+        # Ends the host's fetch in flight, it is fetched again no sooner than
+        # ready_time nor its delay after the pop. Returns True if the host
+        # just became schedulable, like push.
+        if host not in self.busy:
+            return False
+        ready_time = max(self.busy.pop(host), ready_time)
+        self.next_allowed[host] = ready_time
+        if host in self.queues:
+            heapq.heappush(self.heap, (ready_time, host))
+            return True
+        return False
@@ -0,0 +1,30 @@
+import re
+
+# Anchors that lead further down pagination, calendars and the like.
+NAVIGATION_ANCHOR = re.compile(
+    r"^\W*(\d+|next|prev(ious)?|older|newer|first|last|more|page \d+|"
+    r"(next|previous|prev) (page|month|week|day|year|event)s?)\W*$")
+WORD = re.compile(r"[a-z]{3,}")
+
+class UrlScorer(object):
+    # Default priority of a newly discovered url, higher is fetched sooner
+    # within its host. Favors urls close to the seeds, linked with
+    # descriptive anchor text, on hosts where most fetched pages turned out
+    # to be new. Pass another object with the same score method to Frontier
+    # to change the order.
+    DEPTH_WEIGHT = 0.5
+    MAX_DEPTH = 20
+    YIELD_WEIGHT = 3.0
+
+    def score(self, url, depth, anchor, host_yield):
+        # host_yield: share of the host's fetched pages that were new, 0.5
+        # when nothing is known yet.
+        score = -self.DEPTH_WEIGHT * min(depth, self.MAX_DEPTH)
+        anchor = anchor.strip().lower()
+        if not anchor:
+            score -= 0.5
+        elif NAVIGATION_ANCHOR.match(anchor):
+            score -= 2.0
+        elif len(WORD.findall(anchor)) >= 2:
+            score += 1.0
+        return score + self.YIELD_WEIGHT * (host_yield - 0.5)
@@ -0,0 +1,271 @@
+import copy
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+from crawler import Crawler, write_stats
+from crawler.frontier import Frontier
+from crawler.metrics import metrics
+from crawler.simhash_index import SimhashIndex
+from crawler.stats import Stats
+from utils.log import configure_logging
+
+class ShardRouter(object):
+    # Shared between the shard processes. Every host belongs to exactly one
+    # shard, links to a foreign host are sent to the owner's inbox.
+    # pending counts urls queued in, in transit to, or being processed by
+    # any shard. The crawl is over when it drops to zero. progress is the
+    # last time pending changed. Batches of simhash_requests go to the
+    # parent's SimhashServer, each shard gets the answers on its
+    # simhash_replies.
+    def __init__(self, context, shard_count):
+        self.shard_count = shard_count
+        self.inboxes = [context.Queue() for _ in range(shard_count)]
+        self.pending = context.Value("q", 0)
+        self.progress = context.Value("d", time.time(), lock=False)
+        self.ready = context.Barrier(shard_count)
+        self.simhash_requests = context.Queue()
+        self.simhash_replies = [context.Queue() for _ in range(shard_count)]
+
+    def shard_of(self, url):
+        host = urlparse(url).netloc.lower()
+        return zlib.crc32(host.encode("utf-8")) % self.shard_count
+
+    def add_pending(self, count):
+        with self.pending.get_lock():
+            self.pending.value += count
+            self.progress.value = time.time()
+
+    def send(self, shard_id, url, depth=0, anchor=""):
+        self.add_pending(1)
+        self.inboxes[shard_id].put((url, depth, anchor))
+
+class ShardedFrontier(Frontier):
+    # Frontier for the hosts of one shard. Politeness stays correct because
+    # every host is scheduled by exactly one shard.
+    IDLE_POLL = 0.5
+
+    def __init__(self, config, restart, shard_id, router):
+        self.shard_id = shard_id
+        self.router = router
+        super().__init__(config, restart)
+        self.receiver = threading.Thread(target=self._receive, daemon=True)
+        self.receiver.start()
+
+    def _parse_save_file(self):
+        queued = len(self.scheduler)
+        super()._parse_save_file()
+        self.router.add_pending(len(self.scheduler) - queued)
+
+    def _receive(self):
+        inbox = self.router.inboxes[self.shard_id]
+        while True:
+            url, depth, anchor = inbox.get()
+            # The sender already counted it as pending.
+            if not super().add_url(url, depth, anchor):
+                self.router.add_pending(-1)
+
+    def add_url(self, url, depth=0, anchor=""):
+        shard_id = self.router.shard_of(url)
+        if shard_id != self.shard_id:
+            self.router.send(shard_id, url, depth, anchor)
+            return False
+        # Counted before queueing, so a fast worker can't complete it and
+        # drop pending to zero before it was counted.
+        self.router.add_pending(1)
+        if super().add_url(url, depth, anchor):
+            return True
+        self.router.add_pending(-1)
+        return False
+
+    def mark_url_complete(self, url):
+        super().mark_url_complete(url)
+        self.router.add_pending(-1)
+
+    def try_get_tbd_url(self):
+        url, wait_time = super().try_get_tbd_url()
+        if url is None and wait_time is None and self.router.pending.value:
+            return None, self.IDLE_POLL
+        return url, wait_time
+
+    def get_tbd_url(self):
+        with self.condition:
+            while True:
+                url, wait_time = self._pop()
+                if url is not None:
+                    return url
+                if wait_time is None:
+                    if not self.router.pending.value:
+                        return None
+                    wait_time = self.IDLE_POLL
+                self.condition.wait(timeout=wait_time)
+
+class ShardStats(Stats):
+    # Statistics of one shard. Near duplicates are found across all shards:
+    # a page that is new to this shard is also looked up in, and added to,
+    # the parent's SimhashServer. That keeps the merged statistics the same
+    # as a single process crawl's. Requests are sent by one thread: while a
+    # batch is out, the requests made meanwhile queue up and go out together
+    # as the next batch, so there is one round trip per batch, not per page.
+    def __init__(self, shard_id, router, **kwargs):
+        self.shard_id = shard_id
+        self.router = router
+        self.requests = queue.Queue()
+        super().__init__(**kwargs)
+        self.sender = threading.Thread(target=self._send_batches, daemon=True)
+        self.sender.start()
+
+    def _request(self, request):
+        future = Future()
+        with metrics.timer("simhash_request_wait"):
+            self.requests.put((request, future))
+            return future.result()
+
+    def _send_batches(self):
+        replies = self.router.simhash_replies[self.shard_id]
+        while True:
+            batch = [self.requests.get()]
+            while True:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            metrics.inc("simhash_batches")
+            self.router.simhash_requests.put(
+                (self.shard_id, [request for request, _ in batch]))
+            for (_, future), reply in zip(batch, replies.get()):
+                future.set_result(reply)
+
+    def check_and_add(self, simhash, threshold=3):
+        with metrics.locked(self.simhash_lock, "simhash_lock_wait"):
+            if self.simhashes.find(simhash, threshold) is not None:
+                return True
+        if self._request(("check", simhash, threshold)):
+            return True
+        self.add_simhash(simhash)
+        return False
+
+    def load_checkpoint(self, path):
+        super().load_checkpoint(path)
+        # Waits for the reply, so the simhashes are known to the server
+        # before the shards pass the ready barrier.
+        with self.simhash_lock:
+            simhashes = list(self.simhashes)
+        self._request(("add", simhashes, None))
+
+class SimhashServer(threading.Thread):
+    # Runs in the parent process, holds the simhashes of the pages accepted
+    # by every shard. A shard sends (shard_id, requests) and gets back one
+    # answer per request, in order. A request is ("check", simhash,
+    # threshold), answered with True for a near duplicate, else the simhash
+    # is added, or ("add", simhashes, None), answered once they are added.
+    def __init__(self, router):
+        self.router = router
+        self.index = SimhashIndex(max_distance=3)
+        super().__init__(daemon=True)
+
+    def run(self):
+        while True:
+            request = self.router.simhash_requests.get()
+            if request is None:
+                return
+            shard_id, batch = request
+            self.router.simhash_replies[shard_id].put(
+                [self._answer(*request) for request in batch])
+
+    def _answer(self, kind, simhashes, threshold):
+        if kind == "check":
+            duplicate = self.index.find(simhashes, threshold) is not None
+            if not duplicate:
+                self.index.add(simhashes)
+            return duplicate
+        for simhash in simhashes:
+            self.index.add(simhash)
+        return True
+
+    def stop(self):
+        self.router.simhash_requests.put(None)
+        self.join()
+
+class ShardCrawler(Crawler):
+    def __init__(self, config, restart, shard_id, router, results, worker_factory):
+        self.results = results
+        super().__init__(
+            config, restart,
+            frontier_factory=lambda config, restart: ShardedFrontier(
+                config, restart, shard_id, router),
+            worker_factory=worker_factory,
+            stats_factory=lambda **kwargs: ShardStats(shard_id, router, **kwargs))
+
+    def output_stats(self):
+        self.results.put(self.stats.snapshot())
+
+def shard_config(config, shard_id):
+    shard = copy.copy(config)
+    root, ext = os.path.splitext(config.save_file)
+    shard.save_file = f"{root}.{shard_id}{ext}"
+    if config.stats_file:
+        root, ext = os.path.splitext(config.stats_file)
+        shard.stats_file = f"{root}.{shard_id}{ext}"
+    if config.metrics_port:
+        shard.metrics_port = config.metrics_port + shard_id
+    return shard
+
+def run_shard(config, restart, shard_id, router, results, worker_factory):
+    configure_logging(config)
+    crawler = ShardCrawler(
+        shard_config(config, shard_id), restart, shard_id, router, results,
+        worker_factory)
+    # No shard may see pending at zero before every shard has queued its
+    # seeds or resumed urls.
+    router.ready.wait()
+    crawler.start()
+
+# Seconds without any url queued or completed, while urls are still pending,
+# after which the sharded crawl is considered stuck.
+STALL_TIMEOUT = 600
+
+def run_sharded(config, restart, worker_factory):
+    # Runs config.shards crawler processes, each with its own frontier save
+    # file, and writes the merged statistics once all of them are done.
+    context = multiprocessing.get_context("spawn")
+    router = ShardRouter(context, config.shards)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=run_shard,
+            args=(config, restart, shard_id, router, results, worker_factory))
+        for shard_id in range(config.shards)]
+    simhash_server = SimhashServer(router)
+    simhash_server.start()
+    for process in processes:
+        process.start()
+    stats = Stats()
+    received = 0
+    while received < len(processes):
+        try:
+            stats.merge_snapshot(results.get(timeout=1))
+            received += 1
+        except queue.Empty:
+            if any(process.exitcode for process in processes):
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError("A crawler shard failed, see the logs.")
+            # A url lost by a shard keeps pending above zero forever, and
+            # every shard would keep polling for it.
+            if (router.pending.value
+                    and time.time() - router.progress.value > STALL_TIMEOUT):
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError(
+                    f"Sharded crawl made no progress for {STALL_TIMEOUT} "
+                    f"seconds with {router.pending.value} urls pending.")
+    for process in processes:
+        process.join()
+    simhash_server.stop()
+    write_stats(stats)
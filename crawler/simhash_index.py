@@ -0,0 +1,50 @@
+class SimhashIndex(object):
+    # Near-duplicate index for simhash fingerprints (Manku et al., WWW 2007).
+    # The fingerprint is split into max_distance + 1 bands; two fingerprints
+    # within max_distance bits of each other must agree exactly on at least
+    # one band, so a lookup only compares against fingerprints sharing a
+    # band value instead of scanning all of them. Not thread safe.
+    def __init__(self, bits=64, max_distance=3):
+        self.bits = bits
+        self.max_distance = max_distance
+        band_count = max_distance + 1
+        self.bands = []
+        offset = 0
+        for i in range(band_count):
+            width = bits // band_count + (1 if i < bits % band_count else 0)
+            self.bands.append((offset, (1 << width) - 1))
+            offset += width
+        self.tables = [{} for _ in self.bands]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # Every fingerprint lives in every table, the first one is enough.
+        for bucket in self.tables[0].values():
+            yield from bucket
+
+    def find(self, fingerprint, distance=None):
+        # Returns a stored fingerprint within distance bits, or None.
+        if distance is None:
+            distance = self.max_distance
+        if distance > self.max_distance:
+            raise ValueError(
+                f"Index supports distances up to {self.max_distance}, "
+                f"got {distance}.")
+        for (offset, mask), table in zip(self.bands, self.tables):
+            for candidate in table.get((fingerprint >> offset) & mask, ()):
+                if bin(fingerprint ^ candidate).count("1") <= distance:
+                    return candidate
+        return None
+
+    def add(self, fingerprint):
+        for (offset, mask), table in zip(self.bands, self.tables):
+            key = (fingerprint >> offset) & mask
+            bucket = table.get(key)
+            if bucket is None:
+                table[key] = [fingerprint]
+            else:
+                bucket.append(fingerprint)
+        self.count += 1
@@ -0,0 +1,97 @@
+import heapq
+import math
+from array import array
+
+from crawler.counters import ShardedCounter
+from utils.simhash import token_hash
+
+class CountMinSketch(object):
+    # Frequency estimates in fixed memory (Cormode & Muthukrishnan). With
+    # width ceil(e / epsilon) and depth ceil(ln(1 / delta)) an estimate
+    # overcounts by at most epsilon * total with probability 1 - delta, and
+    # never undercounts.
+    def __init__(self, epsilon, delta):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.rows = [array("Q", bytes(8 * self.width)) for _ in range(self.depth)]
+        self.total = 0
+
+    def memory(self):
+        return self.width * self.depth * 8
+
+    def add(self, word, count=1):
+        # Returns the new estimate for word.
+        h1, h2 = self._hashes(word)
+        estimate = None
+        for i, row in enumerate(self.rows):
+            index = (h1 + i * h2) % self.width
+            row[index] += count
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        self.total += count
+        return estimate
+
+    def estimate(self, word):
+        h1, h2 = self._hashes(word)
+        return min(
+            row[(h1 + i * h2) % self.width] for i, row in enumerate(self.rows))
+
+    @staticmethod
+    def _hashes(word):
+        # Double hashing from one cached 64 bit token hash.
+        value = token_hash(word)
+        return value & 0xFFFFFFFF, (value >> 32) | 1
+
+class TopK(object):
+    # The capacity words with the largest estimates. A min-heap with lazy
+    # deletion finds the word to evict, stale entries are skipped when they
+    # reach the top and the heap is rebuilt when it gets too large.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.heap = []
+
+    def offer(self, word, estimate):
+        if word not in self.counts and len(self.counts) >= self.capacity:
+            smallest, smallest_word = self._min()
+            if estimate <= smallest:
+                return
+            del self.counts[smallest_word]
+            heapq.heappop(self.heap)
+        self.counts[word] = estimate
+        heapq.heappush(self.heap, (estimate, word))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(count, word) for word, count in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def most_common(self, n):
+        return heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+
+    def _min(self):
+        while self.heap[0][0] != self.counts.get(self.heap[0][1]):
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+class ApproxCounter(ShardedCounter):
+    # ShardedCounter that folds its shards into a Count-Min sketch and keeps
+    # only the top_k heaviest words, so memory stays flat however large the
+    # vocabulary gets. Counts of the head of the distribution are accurate
+    # to the sketch's error bound, the tail is not kept.
+    def __init__(self, epsilon, delta, top_k, fold_size=50000, track_delta=False):
+        super().__init__(fold_size, track_delta)
+        self.sketch = CountMinSketch(epsilon, delta)
+        self.top_k = TopK(top_k)
+
+    def most_common(self, n):
+        self.fold()
+        with self.lock:
+            return self.top_k.most_common(n)
+
+    def items(self):
+        self.fold()
+        with self.lock:
+            return list(self.top_k.counts.items())
+
+    def _add(self, counts):
+        for word, count in counts.items():
+            self.top_k.offer(word, self.sketch.add(word, count))
@@ -1,41 +1,71 @@
 from urllib.parse import urldefrag, urlparse
+from array import array
+import os
+import pickle
 import threading
+from contextlib import contextmanager
+from crawler.simhash_index import SimhashIndex
+from crawler.counters import ShardedCounter
+from crawler.sketch import ApproxCounter
+from crawler.metrics import metrics
+from crawler.seen import ContentFingerprintSet
 
 class Stats:
-    def __init__(self):
+    def __init__(self, checkpoints=False, sketch=None):
+        # sketch: (epsilon, delta, top_k) to count words approximately in
+        # fixed memory, see crawler/sketch.py.
         self.unique_urls = set()
         self.longest_page = ''
         self.longest_page_words = 0
-        self.word_counts = {}
+        if sketch:
+            self.word_counts = ApproxCounter(*sketch, track_delta=checkpoints)
+        else:
+            self.word_counts = ShardedCounter(track_delta=checkpoints)
         self.subdomains = {}
-        self.simhashes = []
+        self.simhashes = SimhashIndex(max_distance=3)
         self.lock = threading.Lock()
+        self.simhash_lock = threading.Lock()
+        # Exact page copies, only kept for this run. After a restart copies
+        # are still caught by the simhash check, just after parsing.
+        self.contents = ContentFingerprintSet()
+        self.content_lock = threading.Lock()
+        # What changed since the last checkpoint, see take_delta.
+        self.checkpoints = checkpoints
+        self.gate = PageGate()
+        self.new_urls = []
+        self.new_simhashes = []
 
-    def similar(self, simhash, threshold=3):
-        with self.lock:
-            for existing_simhash in self.simhashes:
-                if self.hamming_distance(simhash, existing_simhash) <= threshold:
-                    return True
-        return False
-
-    def hamming_distance(self, hash1, hash2):
-        x = hash1 ^ hash2
-        dist = 0
-        while x:
-            dist += 1
-            x &= x - 1
-        return dist
+    def check_and_add(self, simhash, threshold=3):
+        # Returns True if a similar page was already seen, otherwise records
+        # the simhash. Atomic, so two workers can't both accept near copies.
+        with metrics.locked(self.simhash_lock, "simhash_lock_wait"):
+            if self.simhashes.find(simhash, threshold) is not None:
+                return True
+            self.simhashes.add(simhash)
+            if self.checkpoints:
+                self.new_simhashes.append(simhash)
+            return False
+
+    def seen_content(self, fingerprint):
+        # Returns True if a page with the same content_fingerprint was
+        # already seen, otherwise records it.
+        with self.content_lock:
+            return not self.contents.add(fingerprint)
 
     def add_simhash(self, simhash):
-        with self.lock:
-            self.simhashes.append(simhash)
+        with self.simhash_lock:
+            self.simhashes.add(simhash)
+            if self.checkpoints:
+                self.new_simhashes.append(simhash)
         
     def add_url(self, url):
         url, _ = urldefrag(url)
         parsed = urlparse(url)
-        with self.lock:
+        with metrics.locked(self.lock, "stats_lock_wait"):
             if url not in self.unique_urls:
                 self.unique_urls.add(url)
+                if self.checkpoints:
+                    self.new_urls.append(url)
                 if parsed.netloc.endswith(".uci.edu"):
                     parts = parsed.netloc.lower().split('.')
                     if len(parts) >= 3:
@@ -45,18 +75,15 @@ class Stats:
                     self.subdomains[subdomain] = self.subdomains.get(subdomain, 0) + 1
 
     def update_longest_page(self, url, word_count):
-        with self.lock:
+        with metrics.locked(self.lock, "stats_lock_wait"):
             if word_count > self.longest_page_words:
                 self.longest_page_words = word_count
                 self.longest_page = url
                 
     def add_words(self, words):
-        with self.lock:
-            for word in words:
-                if word in self.word_counts:
-                    self.word_counts[word] += 1
-                else:
-                    self.word_counts[word] = 1
+        # words is a list of tokens or a mapping of token -> count
+        # Counted into a per-thread shard, no shared lock taken here.
+        self.word_counts.update(words)
     
     def get_unique_pages(self):
         with self.lock:
@@ -67,10 +94,126 @@ class Stats:
             return (self.longest_page, self.longest_page_words)
     
     def get_top_50(self):
-        with self.lock:
-            sorted_words = sorted(self.word_counts.items(), key=lambda x: x[1], reverse=True)
-            return sorted_words[:50]
+        return self.word_counts.most_common(50)
     
+    def snapshot(self):
+        # Plain data copy of the statistics, see merge_snapshot.
+        with self.lock:
+            unique_urls = list(self.unique_urls)
+            longest_page = (self.longest_page, self.longest_page_words)
+        with self.simhash_lock:
+            simhashes = list(self.simhashes)
+        return make_snapshot(
+            unique_urls, longest_page, self.word_counts.items(), simhashes)
+
+    def page_update(self):
+        # Wrap all the statistics calls for one page in this, see take_delta.
+        return self.gate.update()
+
+    def take_delta(self):
+        # Snapshot of what changed since the last call, only needs the locks
+        # long enough to swap out the change lists. Pages being added to the
+        # statistics are waited for, so each page is in exactly one delta.
+        with self.gate.exclusive():
+            with self.lock:
+                unique_urls, self.new_urls = self.new_urls, []
+                longest_page = (self.longest_page, self.longest_page_words)
+            with self.simhash_lock:
+                simhashes, self.new_simhashes = self.new_simhashes, []
+            words = self.word_counts.take_delta().items()
+        return make_snapshot(unique_urls, longest_page, words, simhashes)
+
+    def merge_snapshot(self, snapshot):
+        # Adds the statistics of another run or shard to this one.
+        for url in snapshot["unique_urls"]:
+            self.add_url(url)
+        self.update_longest_page(*snapshot["longest_page"])
+        self.add_words(dict(zip(snapshot["words"], snapshot["counts"])))
+        for simhash in snapshot["simhashes"]:
+            self.add_simhash(simhash)
+
+    def checkpoint(self, path):
+        # Appends the changes since the last checkpoint to the file.
+        delta = self.take_delta()
+        with open(path, "ab") as f:
+            pickle.dump(delta, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_checkpoint(self, path):
+        # Replays every checkpoint in the file, then rewrites it as a single
+        # snapshot so the file doesn't grow across restarts.
+        for snapshot in read_snapshots(path):
+            self.merge_snapshot(snapshot)
+        self.take_delta()
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(self.snapshot(), f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
     def get_subdomains(self):
         with self.lock:
             return sorted(self.subdomains.items())
+
+def make_snapshot(unique_urls, longest_page, word_counts, simhashes):
+    # Word counts and simhashes are stored as flat arrays, which pickle far
+    # more compactly than dicts and lists of ints.
+    words = []
+    counts = array("Q")
+    for word, count in word_counts:
+        words.append(word)
+        counts.append(count)
+    return {
+        "unique_urls": unique_urls,
+        "longest_page": longest_page,
+        "words": words,
+        "counts": counts,
+        "simhashes": array("Q", simhashes)}
+
+def read_snapshots(path):
+    # A crash can leave a partly written last record, which is skipped.
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except (EOFError, pickle.UnpicklingError):
+                return
+
+class PageGate(object):
+    # Any number of page updates can run at once. exclusive() waits for the
+    # running ones to finish and holds off new ones, so a checkpoint never
+    # has only part of a page in it.
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.active = 0
+        self.closed = False
+
+    @contextmanager
+    def update(self):
+        with self.condition:
+            while self.closed:
+                self.condition.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.active -= 1
+                if not self.active:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self.condition:
+            while self.closed:
+                self.condition.wait()
+            self.closed = True
+            while self.active:
+                self.condition.wait()
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.closed = False
+                self.condition.notify_all()
@@ -0,0 +1,165 @@
+import random
+import sqlite3
+import threading
+import time
+
+from crawler.metrics import metrics
+
+class FrontierStore(object):
+    # Dict-like save file (urlhash -> (url, completed)) backed by SQLite in
+    # WAL mode. Writes are buffered in memory and committed in batches, when
+    # batch_size changes are pending or every flush_interval seconds, so
+    # workers never wait on the disk. SQLite replays its WAL when the file is
+    # opened again, so a crash loses at most the last unflushed batch.
+    # New urls can be stored as (url, False, priority, depth), which
+    # pending_urls returns on resume. db_id is a random number drawn when
+    # the database is created, files derived from it can record it to tell
+    # whether they still belong to it. after_flush, if set, is called from
+    # the background flusher with the last rowid written so far.
+    # before_flush, if set, is called before each batch is written, anything
+    # that has to be on disk before the progress it led to goes there.
+    def __init__(self, path, batch_size=1000, flush_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()  # guards pending and flushing
+        self.db_lock = threading.Lock()  # guards the connection
+        self.pending = {}
+        self.flushing = {}
+        self.flush_needed = threading.Event()
+        self.closed = False
+        self.after_flush = None
+        self.before_flush = None
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "hash TEXT PRIMARY KEY, url TEXT NOT NULL, completed INTEGER NOT NULL, "
+            "priority REAL NOT NULL DEFAULT 0, depth INTEGER NOT NULL DEFAULT 0)")
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(urls)")}
+        for column, definition in (
+                ("priority", "REAL NOT NULL DEFAULT 0"),
+                ("depth", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                # Save file from before urls were prioritized.
+                self.db.execute(f"ALTER TABLE urls ADD COLUMN {column} {definition}")
+        # Lets resume read only the urls still to be downloaded, best first,
+        # without scanning the whole history.
+        self.db.execute("DROP INDEX IF EXISTS pending_urls")
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS pending_by_priority "
+            "ON urls (priority DESC) WHERE completed = 0")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+        self.db.execute(
+            "INSERT OR IGNORE INTO meta VALUES ('db_id', ?)",
+            (random.getrandbits(63),))
+        self.db_id = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'db_id'").fetchone()[0]
+        self.db.commit()
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+
+    def __contains__(self, urlhash):
+        return self.get(urlhash) is not None
+
+    def __getitem__(self, urlhash):
+        value = self.get(urlhash)
+        if value is None:
+            raise KeyError(urlhash)
+        return value
+
+    def __setitem__(self, urlhash, value):
+        with self.lock:
+            self.pending[urlhash] = value
+            if len(self.pending) >= self.batch_size:
+                self.flush_needed.set()
+
+    def __len__(self):
+        # Rows are never deleted, so the last rowid is the row count.
+        return self.max_rowid()
+
+    def max_rowid(self):
+        self.sync()
+        with self.db_lock:
+            return self.db.execute("SELECT MAX(rowid) FROM urls").fetchone()[0] or 0
+
+    def get(self, urlhash, default=None):
+        with self.lock:
+            if urlhash in self.pending:
+                return self.pending[urlhash][:2]
+            if urlhash in self.flushing:
+                return self.flushing[urlhash][:2]
+        with self.db_lock:
+            row = self.db.execute(
+                "SELECT url, completed FROM urls WHERE hash = ?",
+                (urlhash,)).fetchone()
+        if row is None:
+            return default
+        return (row[0], bool(row[1]))
+
+    def keys(self, after_rowid=0):
+        # after_rowid skips rows written before a known point, new urls
+        # always get a larger rowid.
+        self.sync()
+        reader = sqlite3.connect(self.path)
+        try:
+            for (urlhash,) in reader.execute(
+                    "SELECT hash FROM urls WHERE rowid > ?", (after_rowid,)):
+                yield urlhash
+        finally:
+            reader.close()
+
+    def pending_urls(self):
+        # (url, priority, depth) of the urls not completed yet, highest
+        # priority first and in discovery order within a priority, read from
+        # the pending_by_priority index.
+        self.sync()
+        reader = sqlite3.connect(self.path)
+        try:
+            yield from reader.execute(
+                "SELECT url, priority, depth FROM urls WHERE completed = 0 "
+                "ORDER BY priority DESC, rowid")
+        finally:
+            reader.close()
+
+    def sync(self):
+        with self.db_lock:
+            with self.lock:
+                self.flushing, self.pending = self.pending, {}
+            if self.flushing:
+                if self.before_flush:
+                    self.before_flush()
+                start = time.perf_counter()
+                # Completion only updates completed, priority and depth are
+                # kept from when the url was added.
+                self.db.executemany(
+                    "INSERT INTO urls (hash, url, completed, priority, depth) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(hash) DO UPDATE SET completed = excluded.completed",
+                    [(urlhash, value[0], int(value[1]),
+                      value[2] if len(value) > 2 else 0.0,
+                      value[3] if len(value) > 3 else 0)
+                     for urlhash, value in self.flushing.items()])
+                self.db.commit()
+                metrics.observe("store_flush", time.perf_counter() - start)
+                metrics.inc("store_rows_flushed", len(self.flushing))
+            with self.lock:
+                self.flushing = {}
+
+    def close(self):
+        self.closed = True
+        self.flush_needed.set()
+        self.flusher.join()
+        self.sync()
+        with self.db_lock:
+            self.db.close()
+
+    def _flush_loop(self):
+        while not self.closed:
+            self.flush_needed.wait(timeout=self.flush_interval)
+            self.flush_needed.clear()
+            self.sync()
+            if self.after_flush and not self.closed:
+                self.after_flush(self.max_rowid())
@@ -0,0 +1,122 @@
+import re
+from urllib.parse import parse_qsl, urlsplit
+
+DIGITS = re.compile(r"\d+")
+# Hashes, uuids and other opaque ids.
+OPAQUE_ID = re.compile(r"(?=[^/]*\d)[0-9a-zA-Z_-]{16,}")
+
+ACCEPT, THROTTLE, BLOCK = "accept", "throttle", "block"
+
+def url_template(url):
+    # Returns (host, template, query parameters). In the template digit runs
+    # and opaque ids are collapsed and only the query parameter names are
+    # kept, so /events/2020-01-01?page=3 and /events/2021-12-31?page=9 share
+    # the template /events/#-#-#?page.
+    parts = urlsplit(url)
+    segments = []
+    for segment in parts.path.lower().split("/"):
+        if OPAQUE_ID.fullmatch(segment):
+            segments.append("*")
+        else:
+            segments.append(DIGITS.sub("#", segment))
+    template = "/".join(segments)
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        template += "?" + "&".join(sorted({name for name, _ in params}))
+    return parts.netloc.lower(), template, params
+
+class Family(object):
+    # Statistics of one url template on one host.
+    __slots__ = ("urls", "fetched", "duplicates", "values", "state", "admitted")
+
+    def __init__(self):
+        self.urls = 0
+        self.fetched = 0
+        self.duplicates = 0
+        # parameter name -> distinct values, up to max_param_values + 1
+        self.values = {}
+        self.state = ACCEPT
+        self.admitted = 0
+
+class TrapDetector(object):
+    # Learns url templates per host while the crawl runs and stops families
+    # that explode. A family is throttled, only 1 in throttle new urls kept,
+    # once it has max_urls / 2 urls or a query parameter took more than
+    # max_param_values values. It is blocked at max_urls urls, or once at
+    # least min_samples of its pages were fetched and more than dup_ratio
+    # of them were exact or near duplicates. Each host keeps at most
+    # max_families templates, the least recently used is forgotten first.
+    # Not thread safe, the Frontier serializes access.
+    def __init__(self, max_urls=2000, max_param_values=200, dup_ratio=0.5,
+                 throttle=10, min_samples=20, max_families=256):
+        self.max_urls = max_urls
+        self.max_param_values = max_param_values
+        self.dup_ratio = dup_ratio
+        self.throttle = throttle
+        self.min_samples = min_samples
+        self.max_families = max_families
+        # host -> {template: Family}, in least recently used order
+        self.hosts = {}
+
+    def admit(self, url):
+        # Call for every newly discovered url. Returns (admitted, change,
+        # template), change is the family's new state if this url changed
+        # it, else None.
+        host, template, params = url_template(url)
+        family = self._family(host, template)
+        family.urls += 1
+        for name, value in params:
+            values = family.values.setdefault(name, set())
+            if len(values) <= self.max_param_values:
+                values.add(value)
+        change = self._update(family)
+        if family.state == THROTTLE:
+            family.admitted += 1
+            admitted = (family.admitted - 1) % self.throttle == 0
+        else:
+            admitted = family.state == ACCEPT
+        return admitted, change, template
+
+    def record_page(self, url, duplicate):
+        # Feedback from a fetched page, duplicate if it was rejected as an
+        # exact or near copy of a page already seen. Returns (change,
+        # template) like admit.
+        host, template, _ = url_template(url)
+        family = self.hosts.get(host, {}).get(template)
+        if family is None:
+            return None, template
+        family.fetched += 1
+        if duplicate:
+            family.duplicates += 1
+        return self._update(family), template
+
+    def _family(self, host, template):
+        families = self.hosts.get(host)
+        if families is None:
+            families = self.hosts[host] = {}
+        family = families.pop(template, None)
+        if family is None:
+            family = Family()
+            if len(families) >= self.max_families:
+                del families[next(iter(families))]
+        families[template] = family
+        return family
+
+    def _update(self, family):
+        # Families only ever get stricter. Returns the new state if it
+        # changed, else None.
+        if family.state == BLOCK:
+            return None
+        state = family.state
+        if family.urls > self.max_urls or (
+                family.fetched >= self.min_samples
+                and family.duplicates > self.dup_ratio * family.fetched):
+            state = BLOCK
+        elif family.urls > self.max_urls // 2 or any(
+                len(values) > self.max_param_values
+                for values in family.values.values()):
+            state = THROTTLE
+        if state == family.state:
+            return None
+        family.state = state
+        return state
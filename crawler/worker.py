@@ -1,21 +1,21 @@
-import hashlib
 import scraper
+import time
 from threading import Thread
 from inspect import getsource
 from utils.download import download
 from utils import get_logger
+from utils.page import analyze_page
 from crawler.stats import Stats
-from bs4 import BeautifulSoup
-import re
-from nltk.corpus import stopwords
-stop_words = set(stopwords.words('english'))
+from crawler.metrics import metrics
+from crawler.seen import content_fingerprint
 
 class Worker(Thread):
-    def __init__(self, worker_id, config, frontier, stats):
-        self.logger = get_logger(f"Worker-{worker_id}", "Worker")
+    def __init__(self, worker_id, config, frontier, stats, parse_pool=None):
+        self.logger = get_logger(f"Worker-{worker_id}", "Worker", sampled=True)
         self.config = config
         self.frontier = frontier
         self.stats = stats
+        self.parse_pool = parse_pool
         # basic check for requests in scraper
         assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
         assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
@@ -23,56 +23,86 @@ class Worker(Thread):
         
     def run(self):
         while True:
-            tbd_url = self.frontier.get_tbd_url()
+            with metrics.timer("frontier_wait"):
+                tbd_url = self.frontier.get_tbd_url()
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
-            resp = download(tbd_url, self.config, self.logger)
+            start = time.perf_counter()
+            try:
+                resp = download(tbd_url, self.config, self.logger)
+            except Exception as e:
+                # Still completed, a sharded frontier waits for every url.
+                self.logger.error(f"Failed to download {tbd_url}: {e}")
+                self.frontier.record_response(
+                    tbd_url, None, time.perf_counter() - start)
+                self.frontier.mark_url_complete(tbd_url)
+                continue
+            elapsed = time.perf_counter() - start
+            metrics.observe("download", elapsed)
+            metrics.inc("pages_downloaded")
+            self.frontier.record_response(tbd_url, resp, elapsed)
             self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            self.frontier.mark_url_complete(tbd_url)
+                "Downloaded %s, status <%s>, using cache %s.",
+                tbd_url, resp.status, self.config.cache_server)
+            self.process(tbd_url, resp)
+
+    def process(self, tbd_url, resp):
+        try:
+            if resp.too_large:
+                metrics.inc("pages_too_large")
+                self.logger.info("Page %s dropped: %s", tbd_url, resp.error)
+                return
             if resp.status == 200 and resp.raw_response and resp.raw_response.content:
-                # Parse the content to extract words
-                words = self.get_words(resp.raw_response.content)
-                if len(words) < 50:
-                    self.logger.info(f"Page {tbd_url} ignored due to low word count ({len(words)}).")
-                    continue
-                simhash = self.compute_simhash(words)
-                # Check for similarity before adding to statistics
-                if self.stats.similar(simhash):
-                    self.logger.info(f"Page {tbd_url} is similar to an already seen page, skipping.")
-                    continue
-                # Update stats after confirming uniqueness
-                self.stats.add_url(tbd_url)
-                self.stats.add_simhash(simhash)
-                self.stats.add_words(words)
-                self.stats.update_longest_page(tbd_url, len(words))
+                if not resp.is_html():
+                    metrics.inc("pages_not_html")
+                    self.logger.info("Page %s ignored, content type %s.", tbd_url, resp.content_type)
+                    return
+                content = resp.raw_response.content
+                # Byte for byte copies are dropped before any parsing
+                if self.stats.seen_content(content_fingerprint(content)):
+                    metrics.inc("pages_exact_duplicate")
+                    self.frontier.record_page(tbd_url, True)
+                    metrics.inc("parse_bytes_saved", len(content))
+                    self.logger.info("Page %s is an exact copy of an already seen page, skipping.", tbd_url)
+                    return
+                # Parse the content once for words, simhash and links
+                page = self.analyze(content, tbd_url, resp.charset)
+                metrics.observe("parse", page.parse_time)
+                metrics.observe("simhash", page.simhash_time)
+                if page.word_count < 50:
+                    metrics.inc("pages_low_words")
+                    self.logger.info("Page %s ignored due to low word count (%d).", tbd_url, page.word_count)
+                    return
+                # Check for similarity before adding to statistics, all of
+                # the page goes into the same stats checkpoint
+                with self.stats.page_update():
+                    duplicate = self.stats.check_and_add(page.simhash)
+                    if not duplicate:
+                        self.stats.add_url(tbd_url)
+                        self.stats.add_words(page.word_counts)
+                        self.stats.update_longest_page(tbd_url, page.word_count)
+                if duplicate:
+                    metrics.inc("pages_near_duplicate")
+                    self.frontier.record_page(tbd_url, True)
+                    self.logger.info("Page %s is similar to an already seen page, skipping.", tbd_url)
+                    return
+                metrics.inc("pages_accepted")
+                self.frontier.record_page(tbd_url, False)
                 # Add scraped URLs to the frontier
-                scraped_urls = scraper.scraper(tbd_url, resp)
+                scraped_urls = scraper.scraper(tbd_url, resp, page.links)
+                depth = self.frontier.depth_of(tbd_url) + 1
+                added = 0
                 for scraped_url in scraped_urls:
-                    self.frontier.add_url(scraped_url)
+                    if self.frontier.add_url(scraped_url, depth, page.anchors.get(scraped_url, "")):
+                        added += 1
+                metrics.inc("urls_added", added)
+        finally:
+            # Marked complete only once its links are in the frontier, so a
+            # sharded frontier knows when this url's work is really done.
+            self.frontier.mark_url_complete(tbd_url)
     
-    def get_words(self, content):
-        soup = BeautifulSoup(content, 'lxml')
-        text = soup.get_text()
-        words = re.findall(r'\b[a-zA-Z]{2,}\b', text.lower())
-        words = [word for word in words if word not in stop_words]
-        return words
-        
-    def compute_simhash(self, words):
-        hash_bits = 64
-        v = [0] * hash_bits
-        for word in words:
-            hash_value = int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16)
-            for i in range(hash_bits):
-                bitmask = 1 << i
-                if hash_value & bitmask:
-                    v[i] += 1
-                else:
-                    v[i] -= 1
-        fingerprint = 0
-        for i in range(hash_bits):
-            if v[i] >= 0:
-                fingerprint |= 1 << i
-        return fingerprint
+    def analyze(self, content, url, encoding=None):
+        if self.parse_pool:
+            return self.parse_pool.analyze(content, url, encoding)
+        return analyze_page(content, url, encoding)
@@ -3,16 +3,25 @@ from argparse import ArgumentParser
 
 from utils.server_registration import get_cache_server
 from utils.config import Config
+from utils.log import configure_logging
 from crawler import Crawler
+from crawler.worker import Worker
+from crawler.async_worker import AsyncWorker
+from crawler.shards import run_sharded
 
 
 def main(config_file, restart):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
+    configure_logging(config)
     config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
-    crawler.start()
+    worker_factory = AsyncWorker if config.max_in_flight > 0 else Worker
+    if config.shards > 1:
+        run_sharded(config, restart, worker_factory)
+    else:
+        crawler = Crawler(config, restart, worker_factory=worker_factory)
+        crawler.start()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,50 @@
-import re
-from urllib.parse import urlparse, urljoin, urldefrag
-from bs4 import BeautifulSoup
+from utils.page import extract_links
+from utils.url_filter import UrlFilter
 
-def scraper(url, resp):
-    links = extract_next_links(url, resp)
+# Crawl rules, compiled once into url_filter below (see utils/url_filter.py).
+# (domain, include subdomains, required path prefix)
+ALLOWED_DOMAINS = [
+    ("ics.uci.edu", True, None),
+    ("cs.uci.edu", True, None),
+    ("informatics.uci.edu", True, None),
+    ("stat.uci.edu", True, None),
+    ("today.uci.edu", False, "/department/information_computer_sciences"),
+]
+
+# traps i fell into, a url is rejected if its query contains one of
+# QUERY_TRAPS or its path contains one of PATH_TRAPS
+QUERY_TRAPS = [
+    "do=login", "do=revisions", "do=edit", "do=media", "image=", "ical=1",
+    "outlook-ical=1", "tribe-bar-date", "redirect", "share=", "filter",
+    "action=download", "action=login", "idx=", "version=", "precision=", "rev="]
+PATH_TRAPS = [
+    "/-/commit", "/-/blob", "/-/blame", "/-/tree", "/-/branches", "/-/forks",
+    "/-/merge_requests", "~eppstein/pix/", "/zip-attachment/", "/attachment/",
+    "/-/tags/"]
+
+# useless files
+IGNORED_EXTENSIONS = (
+    "css js bmp gif jpg jpeg ico grm psp git png tif tiff mid mp2 mp3 mp4 mpg "
+    "scm bib h wav avi mov mpeg ram m4v mkv ogg ogv pdf ps eps tex ppt pptx "
+    "doc docx xls xlsx names data dat exe bz2 tar msi bin 7z psd dmg iso epub "
+    "dll cnf tgz sha1 txt py ff cpp md cp thmx mso arff rtf jar csv ppsx java "
+    "patch rm smil wmv swf wma zip rar gz apk war img sql").split()
+
+# too long URLs are prob traps, and so are paths that repeat a segment
+MAX_URL_LENGTH = 1000
+MAX_SEGMENT_REPEATS = 2
+
+url_filter = UrlFilter(
+    ALLOWED_DOMAINS, QUERY_TRAPS, PATH_TRAPS, IGNORED_EXTENSIONS,
+    MAX_URL_LENGTH, MAX_SEGMENT_REPEATS)
+
+def scraper(url, resp, links=None):
+    # links: hyperlinks already extracted from resp, e.g. by the worker's
+    # single parse of the page. They still go through extract_next_links.
+    links = extract_next_links(url, resp, links)
     return [link for link in links if is_valid(link)]
 
-def extract_next_links(url, resp):
+def extract_next_links(url, resp, links=None):
     # url: the URL that was used to get the page
     # resp.url: the actual url of the page
     # resp.status: the status code returned by the server. 200 is OK, you got the page. Other numbers mean that there was some kind of problem.
@@ -14,6 +52,7 @@ def extract_next_links(url, resp):
     # resp.raw_response: this is where the page actually is. More specifically, the raw_response has two parts:
     #         resp.raw_response.url: the url, again
     #         resp.raw_response.content: the content of the page!
+    # links: the hyperlinks of the page if the caller already parsed it, any extra link rules go at the end so they apply either way.
     # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
     if resp.status != 200:
         return []
@@ -24,87 +63,18 @@ def extract_next_links(url, resp):
     if len(resp.raw_response.content) == 0:
         return []
     
-    # make it a set to avoid duplicates
-    links = set()
-    # beautiful soup is HTML parser
-    souped = BeautifulSoup(resp.raw_response.content, 'lxml')
-
-    # save all a tags because they contain URLs
-    for atag in souped.find_all('a'):
-        href = atag.get('href')
-        if href:
-            href, _ = urldefrag(href)
-            new_url = urljoin(url, href)
-            links.add(new_url)
-    # return the set as a list because that's how implementation is meant to be
-    return list(links)
+    # streaming parse, collects the href of every a tag without building a
+    # tree. links come back absolute, defragged and without duplicates
+    if links is None:
+        links = extract_links(resp.raw_response.content, url, resp.charset)
+    return links
 
 def is_valid(url):
     # Decide whether to crawl this url or not. 
     # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
+    # Conditions are declared at the top of this file.
     try:
-        
-        # parse the url. example:
-        # urlparse("http://docs.python.org:80/3/library/urllib.parse.html?"
-        #     "highlight=params#url-parsing")
-        # ParseResult(scheme='http', netloc='docs.python.org:80',
-        #     path='/3/library/urllib.parse.html', params='',
-        #     query='highlight=params', fragment='url-parsing')
-        parsed = urlparse(url)
-        
-        # get rid of non http and https urls
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-        
-        # get rid of anything outside our crawling conditions
-        domain = parsed.netloc.lower()
-        path = parsed.path.lower()
-        if not (
-            domain.endswith(".ics.uci.edu") or domain == "ics.uci.edu" or
-            domain.endswith(".cs.uci.edu") or domain == "cs.uci.edu" or
-            domain.endswith(".informatics.uci.edu") or domain == "informatics.uci.edu" or
-            domain.endswith(".stat.uci.edu") or domain == "stat.uci.edu" or
-            (domain == "today.uci.edu" and path.startswith("/department/information_computer_sciences"))
-        ):
-            return False
-        
-        # get rid of traps i fell into
-        if any(param in parsed.query for param in ["do=login", "do=revisions", "do=edit", "do=media", "image=", "ical=1", "outlook-ical=1", "tribe-bar-date", "redirect", "share=", "filter", "action=download", "action=login", "idx=", "version=", "precision=", "rev="]):
-            return False
-        
-        if any(param in parsed.path for param in ["/-/commit", "/-/blob", "/-/blame", "/-/tree", "/-/branches", "/-/forks", "/-/merge_requests", "~eppstein/pix/", "/zip-attachment/", "/attachment/", "/-/tags/"]):
-            return False
-
-        # get rid of useless files
-        if re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico|grm|psp|git"
-            + r"|png|tiff?|mid|mp2|mp3|mp4|mpg|scm|bib|h"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1|txt|py|ff|cpp|md|cp"
-            + r"|thmx|mso|arff|rtf|jar|csv|ppsx|java|patch"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz|apk|war|img|sql)$", parsed.path.lower()):
-            return False
-
-        # get rid of too long URLs, prob traps
-        if len(url) > 1000:
-            return False
-        
-        # if a url repeats a segment too much, fix it
-        path_segments = parsed.path.split('/')
-        segment_counts = {}
-        for segment in path_segments:
-            if segment in segment_counts:
-                segment_counts[segment] += 1
-                if segment_counts[segment] >= 3:
-                    return False
-            else:
-                segment_counts[segment] = 1
-
-        return True
-
+        return url_filter.accepts(url)
     except TypeError:
-        print ("TypeError for ", parsed)
+        print ("TypeError for ", url)
         raise
\ No newline at end of file
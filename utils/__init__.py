@@ -2,23 +2,17 @@ import os
 import logging
 from hashlib import sha256
 from urllib.parse import urlparse
+from utils.log import attach_handlers
 
-def get_logger(name, filename=None):
+def get_logger(name, filename=None, sampled=False):
+    # sampled loggers log per-url messages, which are thinned out according
+    # to the [LOGGING] settings, see utils.log.configure_logging.
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
     if not os.path.exists("Logs"):
         os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    attach_handlers(
+        logger, f"Logs/{filename if filename else name}.log", sampled)
     return logger
 
 
@@ -0,0 +1,136 @@
+import asyncio
+import cbor
+from urllib.parse import urlencode
+
+from utils.response import Response
+from utils.download import ENVELOPE_SIZE, oversized
+
+class AsyncCacheClient(object):
+    # Minimal HTTP/1.1 client for the cache server on asyncio streams. Up to
+    # max_connections requests run at once, each on its own connection, and
+    # connections are kept alive and reused between requests. With timeout,
+    # connecting and each request are given up after that many seconds.
+    def __init__(self, host, port, max_connections=100, timeout=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(max_connections)
+        self.idle = []
+
+    async def download(self, url, config, logger=None):
+        # Same contract as utils.download.download.
+        query = urlencode([("q", f"{url}"), ("u", f"{config.user_agent}")])
+        limit = config.max_page_size + ENVELOPE_SIZE if config.max_page_size else 0
+        async with self.slots:
+            status, body = await self._get(f"/?{query}", limit)
+        if body is None:
+            return oversized(url, status, config.max_page_size)
+        try:
+            if 200 <= status < 400 and body:
+                return Response(cbor.loads(body), config.max_page_size)
+        except (EOFError, ValueError) as e:
+            pass
+        logger.error(f"Spacetime Response error <{status}> with url {url}.")
+        return Response({
+            "error": f"Spacetime Response error <{status}> with url {url}.",
+            "status": status,
+            "url": url})
+
+    async def close(self):
+        while self.idle:
+            _, writer = self.idle.pop()
+            writer.close()
+
+    async def _get(self, target, limit=0):
+        # Idle connections may have been closed by the server in the
+        # meantime, those are dropped and the request is retried. Errors on
+        # a fresh connection are raised.
+        while True:
+            reused = bool(self.idle)
+            connection = self.idle.pop() if reused else await self._connect()
+            try:
+                return await asyncio.wait_for(
+                    self._request(connection, target, limit), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                connection[1].close()
+                if not reused:
+                    raise
+            except BaseException:
+                # Timed out, cancelled or a malformed response, the
+                # connection is in an unknown state.
+                connection[1].close()
+                raise
+
+    async def _connect(self):
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+
+    async def _request(self, connection, target, limit=0):
+        # Returns (status, body), body is None if it is over limit bytes, in
+        # which case the connection is closed instead of read to the end.
+        reader, writer = connection
+        writer.write(
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Connection: keep-alive\r\n"
+            "Accept-Encoding: identity\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Cache server closed the connection.")
+        version, status = status_line.decode("latin-1").split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = (
+            version == "HTTP/1.1"
+            and headers.get("connection", "").lower() != "close")
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            body = await self._read_chunked(reader, limit)
+        elif "content-length" in headers:
+            length = int(headers["content-length"])
+            if limit and length > limit:
+                body = None
+            else:
+                body = await reader.readexactly(length)
+        else:
+            body = await self._read_to_eof(reader, limit)
+            keep_alive = False
+        if body is None:
+            keep_alive = False
+        if keep_alive:
+            self.idle.append(connection)
+        else:
+            writer.close()
+        return int(status), body
+
+    async def _read_chunked(self, reader, limit=0):
+        chunks = []
+        total = 0
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            total += size
+            if limit and total > limit:
+                return None
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def _read_to_eof(self, reader, limit=0):
+        chunks = []
+        total = 0
+        while True:
+            chunk = await reader.read(1 << 16)
+            if not chunk:
+                return b"".join(chunks)
+            total += len(chunk)
+            if limit and total > limit:
+                return None
+            chunks.append(chunk)
@@ -9,11 +9,43 @@ class Config(object):
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.save_batch = config["LOCAL PROPERTIES"].getint("SAVEBATCH", 1000)
+        self.save_interval = config["LOCAL PROPERTIES"].getfloat("SAVEINTERVAL", 5.0)
+        self.parse_processes = config["LOCAL PROPERTIES"].getint("PARSEPROCESSES", 0)
+        self.parse_queue = config["LOCAL PROPERTIES"].getint("PARSEQUEUE", 0)
+        self.max_in_flight = config["LOCAL PROPERTIES"].getint("MAXINFLIGHT", 0)
+        self.download_timeout = config["LOCAL PROPERTIES"].getfloat("DOWNLOADTIMEOUT", 60.0)
+        self.shards = config["LOCAL PROPERTIES"].getint("SHARDS", 1)
+        self.stats_file = config["LOCAL PROPERTIES"].get("STATSFILE", "").strip()
+        self.word_sketch = None
+        if config["LOCAL PROPERTIES"].getboolean("WORDSKETCH", False):
+            self.word_sketch = (
+                config["LOCAL PROPERTIES"].getfloat("SKETCHERROR", 0.00001),
+                1 - config["LOCAL PROPERTIES"].getfloat("SKETCHCONFIDENCE", 0.99),
+                config["LOCAL PROPERTIES"].getint("SKETCHTOPK", 1000))
+        self.max_page_size = config["LOCAL PROPERTIES"].getint("MAXPAGESIZE", 0)
+        self.metrics_port = config["LOCAL PROPERTIES"].getint("METRICSPORT", 0)
+        self.metrics_interval = config["LOCAL PROPERTIES"].getfloat("METRICSINTERVAL", 60.0)
+
+        # The [LOGGING] section is optional.
+        self.log_queue = config.getboolean("LOGGING", "QUEUE", fallback=False)
+        self.log_format = config.get("LOGGING", "FORMAT", fallback="text").strip().lower()
+        self.log_sample = config.getint("LOGGING", "SAMPLE", fallback=1)
+        self.log_rate = config.getint("LOGGING", "RATE", fallback=0)
+        self.log_batch = config.getint("LOGGING", "BATCH", fallback=100)
+        self.log_flush_interval = config.getfloat("LOGGING", "FLUSHINTERVAL", fallback=1.0)
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.max_time_delay = config["CRAWLER"].getfloat("MAXPOLITENESS", 30.0)
+        self.latency_factor = config["CRAWLER"].getfloat("LATENCYFACTOR", 1.0)
+        self.prioritize = config["CRAWLER"].getboolean("PRIORITIZE", True)
+        self.trap_max_urls = config["CRAWLER"].getint("TRAPMAXURLS", 2000)
+        self.trap_param_values = config["CRAWLER"].getint("TRAPPARAMVALUES", 200)
+        self.trap_dup_ratio = config["CRAWLER"].getfloat("TRAPDUPRATIO", 0.5)
+        self.trap_throttle = config["CRAWLER"].getint("TRAPTHROTTLE", 10)
 
         self.cache_server = None
\ No newline at end of file
@@ -1,17 +1,34 @@
 import requests
 import cbor
+import threading
 import time
 
 from utils.response import Response
 
+# One keep-alive session per worker thread, requests.Session isn't thread safe.
+sessions = threading.local()
+
+# Room for the CBOR and pickle wrapping around a page of max_page_size bytes.
+ENVELOPE_SIZE = 1 << 16
+
+def get_session():
+    if not hasattr(sessions, "session"):
+        sessions.session = requests.Session()
+    return sessions.session
+
 def download(url, config, logger=None):
     host, port = config.cache_server
-    resp = requests.get(
+    resp = get_session().get(
         f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+        params=[("q", f"{url}"), ("u", f"{config.user_agent}")],
+        stream=True)
+    limit = config.max_page_size + ENVELOPE_SIZE if config.max_page_size else 0
+    content = read_body(resp, limit)
+    if content is None:
+        return oversized(url, resp.status_code, config.max_page_size)
     try:
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+        if resp and content:
+            return Response(cbor.loads(content), config.max_page_size)
     except (EOFError, ValueError) as e:
         pass
     logger.error(f"Spacetime Response error {resp} with url {url}.")
@@ -19,3 +36,29 @@ def download(url, config, logger=None):
         "error": f"Spacetime Response error {resp} with url {url}.",
         "status": resp.status_code,
         "url": url})
+
+def read_body(resp, limit=0):
+    # The body of a streamed response, or None once it is over limit bytes,
+    # without reading the rest of it.
+    if not limit:
+        return resp.content
+    if int(resp.headers.get("Content-Length") or 0) > limit:
+        resp.close()
+        return None
+    chunks = []
+    size = 0
+    for chunk in resp.iter_content(1 << 16):
+        size += len(chunk)
+        if size > limit:
+            resp.close()
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def oversized(url, status, max_size):
+    resp = Response({
+        "error": f"Response for {url} is over the {max_size} byte limit.",
+        "status": status,
+        "url": url})
+    resp.too_large = True
+    return resp
@@ -0,0 +1,173 @@
+import atexit
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+class LogSettings(object):
+    # Defaults match the original behaviour: synchronous text logging of
+    # every message.
+    use_queue = False
+    json = False
+    sample = 1
+    rate = 0
+    batch = 100
+    flush_interval = 1.0
+
+settings = LogSettings()
+listener = None
+log_queue = None
+file_router = None
+
+def configure_logging(config):
+    # Call once per process before the first get_logger.
+    global listener, log_queue, file_router
+    settings.use_queue = config.log_queue
+    settings.json = config.log_format == "json"
+    settings.sample = max(config.log_sample, 1)
+    settings.rate = config.log_rate
+    settings.batch = config.log_batch
+    settings.flush_interval = config.log_flush_interval
+    if settings.use_queue and listener is None:
+        log_queue = queue.SimpleQueue()
+        file_router = FileRouter()
+        console = logging.StreamHandler()
+        console.setLevel(logging.INFO)
+        console.setFormatter(logging.Formatter(FORMAT))
+        listener = QueueListener(
+            log_queue, console, file_router, respect_handler_level=True)
+        listener.start()
+        atexit.register(stop_logging)
+
+def stop_logging():
+    # Drains the queue and flushes the log files.
+    global listener
+    if listener is not None:
+        listener.stop()
+        file_router.close()
+        listener = None
+
+def make_formatter():
+    return JsonFormatter() if settings.json else logging.Formatter(FORMAT)
+
+def attach_handlers(logger, filename, sampled):
+    if sampled and (settings.sample > 1 or settings.rate > 0):
+        logger.addFilter(SampleFilter(settings.sample, settings.rate))
+    if settings.use_queue:
+        file_router.register(logger.name, filename)
+        logger.addHandler(LocalQueueHandler(log_queue))
+        return
+    fh = logging.FileHandler(filename)
+    fh.setLevel(logging.DEBUG)
+    fh.setFormatter(make_formatter())
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    ch.setFormatter(logging.Formatter(FORMAT))
+    logger.addHandler(fh)
+    logger.addHandler(ch)
+
+class LocalQueueHandler(QueueHandler):
+    # The queue never leaves the process, so the record is queued as is and
+    # the message is only formatted on the listener thread.
+    def prepare(self, record):
+        return record
+
+class SampleFilter(logging.Filter):
+    # Lets through every sample-th INFO or DEBUG record and at most rate of
+    # them per second (0 for no limit). Warnings and errors always pass.
+    def __init__(self, sample=1, rate=0):
+        super().__init__()
+        self.sample = sample
+        self.rate = rate
+        self.counter = itertools.count()
+        self.second = 0
+        self.in_second = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if next(self.counter) % self.sample:
+            return False
+        if self.rate:
+            # Approximate under contention, which is fine for a limit.
+            second = int(record.created)
+            if second != self.second:
+                self.second = second
+                self.in_second = 0
+            self.in_second += 1
+            return self.in_second <= self.rate
+        return True
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line.
+    def format(self, record):
+        entry = {
+            "time": record.created,
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage()}
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+class BatchingFileHandler(logging.FileHandler):
+    # Writes lines to the file's buffer and flushes once batch lines are
+    # waiting or every flush_interval seconds, instead of after every record.
+    def __init__(self, filename, batch, flush_interval):
+        super().__init__(filename)
+        self.batch = batch
+        self.waiting = 0
+        self.flusher = threading.Thread(
+            target=self._flush_loop, args=(flush_interval,), daemon=True)
+        self.flusher.start()
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            self.waiting += 1
+            if self.waiting >= self.batch:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        with self.lock:
+            self.waiting = 0
+            super().flush()
+
+    def _flush_loop(self, interval):
+        while self.stream is not None:
+            time.sleep(interval)
+            self.flush()
+
+class FileRouter(logging.Handler):
+    # Listener side handler that writes each record to its logger's file,
+    # with one BatchingFileHandler per file.
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.files = {}
+        self.handlers = {}
+
+    def register(self, name, filename):
+        with self.lock:
+            self.files[name] = filename
+            if filename not in self.handlers:
+                handler = BatchingFileHandler(
+                    filename, settings.batch, settings.flush_interval)
+                handler.setFormatter(make_formatter())
+                self.handlers[filename] = handler
+
+    def emit(self, record):
+        handler = self.handlers.get(self.files.get(record.name))
+        if handler is not None:
+            handler.handle(record)
+
+    def close(self):
+        for handler in self.handlers.values():
+            handler.close()
+        super().close()
@@ -0,0 +1,130 @@
+import codecs
+import re
+import time
+from collections import Counter, namedtuple
+from urllib.parse import urldefrag, urljoin
+from bs4.dammit import EncodingDetector
+from lxml import etree
+from nltk.corpus import stopwords
+from utils.simhash import compute_simhash
+
+stop_words = set(stopwords.words('english'))
+word_pattern = re.compile(r'\b[a-zA-Z]{2,}\b')
+
+Page = namedtuple("Page", ["words", "links"])
+PageResult = namedtuple(
+    "PageResult", ["word_count", "word_counts", "simhash", "links",
+                   "anchors", "parse_time", "simhash_time"])
+
+class PageTarget(object):
+    # lxml parser target. Gets start/end/data events while the page is
+    # parsed and keeps only visible text, a hrefs and their anchor text, no
+    # tree is built.
+    SKIPPED_TAGS = {"script", "style", "template"}
+
+    def __init__(self, collect_text=True):
+        self.collect_text = collect_text
+        self.text = []
+        self.hrefs = []
+        # anchor text of each href, as a list of text pieces
+        self.anchors = []
+        self.anchor = None
+        self.skip_depth = 0
+
+    def start(self, tag, attrib):
+        if tag == "a":
+            href = attrib.get("href")
+            if href:
+                self.hrefs.append(href)
+                self.anchor = []
+                self.anchors.append(self.anchor)
+        elif tag in self.SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def end(self, tag):
+        if tag == "a":
+            self.anchor = None
+        elif tag in self.SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, data):
+        if self.collect_text and not self.skip_depth:
+            self.text.append(data)
+            if self.anchor is not None:
+                self.anchor.append(data)
+
+    def close(self):
+        return self
+
+def _known_encoding(name):
+    try:
+        return codecs.lookup(name).name if name else None
+    except LookupError:
+        return None
+
+def decode_page(content, encoding=None):
+    # Page bytes to text. encoding is the charset from the HTTP headers, if
+    # any. Otherwise follows what BeautifulSoup did, minus its slow
+    # statistical guess: a byte order mark, then a <meta> charset, then
+    # UTF-8 if the bytes are valid UTF-8, else windows-1252.
+    if isinstance(content, str):
+        return content
+    content, bom_encoding = EncodingDetector.strip_byte_order_mark(content)
+    encoding = (
+        _known_encoding(encoding) or bom_encoding
+        or _known_encoding(EncodingDetector.find_declared_encoding(content, is_html=True)))
+    if encoding is None:
+        try:
+            return content.decode("utf-8")
+        except UnicodeDecodeError:
+            encoding = "windows-1252"
+    return content.decode(encoding, errors="replace")
+
+def _parse(content, collect_text, encoding=None):
+    target = PageTarget(collect_text)
+    parser = etree.HTMLParser(target=target)
+    try:
+        parser.feed(decode_page(content, encoding))
+        parser.close()
+    except etree.LxmlError:
+        pass
+    return target
+
+def _resolve_links(url, hrefs, anchors=None):
+    # Absolute link -> anchor text (the first non-empty one if the link
+    # appears more than once), in the order the links appear.
+    links = {}
+    for i, href in enumerate(hrefs):
+        href, _ = urldefrag(href)
+        link = urljoin(url, href)
+        if not links.get(link):
+            links[link] = " ".join("".join(anchors[i]).split()) if anchors else ""
+    return links
+
+def _parse_page(content, url, encoding=None):
+    target = _parse(content, True, encoding)
+    text = "".join(target.text).lower()
+    words = [word for word in word_pattern.findall(text) if word not in stop_words]
+    return words, _resolve_links(url, target.hrefs, target.anchors)
+
+def parse_page(content, url, encoding=None):
+    # Single pass over the page that returns both the tokens (lowercased,
+    # stop words removed) and the absolute links without fragments.
+    words, links = _parse_page(content, url, encoding)
+    return Page(words, list(links))
+
+def extract_links(content, url, encoding=None):
+    return list(_resolve_links(url, _parse(content, False, encoding).hrefs))
+
+def analyze_page(content, url, encoding=None):
+    # All the CPU heavy work for one page. Module level and returning only
+    # plain data so it can run in a ProcessPoolExecutor, see ParsePool.
+    # Timings are returned rather than recorded for the same reason.
+    start = time.perf_counter()
+    words, anchors = _parse_page(content, url, encoding)
+    word_counts = Counter(words)
+    parsed = time.perf_counter()
+    simhash = compute_simhash(word_counts)
+    return PageResult(
+        len(words), word_counts, simhash, list(anchors), anchors,
+        parsed - start, time.perf_counter() - parsed)
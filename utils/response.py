@@ -1,14 +1,69 @@
 import pickle
 
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+
 class Response(object):
-    def __init__(self, resp_dict):
+    # The embedded requests.Response is only unpickled on first access to
+    # raw_response, so pages that are dropped early never pay for it. size
+    # is the length of the pickled payload, known without unpickling. With
+    # max_size, larger payloads are discarded right away and raw_response
+    # is None.
+    def __init__(self, resp_dict, max_size=0):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        self.payload = resp_dict.get("response")
+        self.size = len(self.payload) if isinstance(self.payload, bytes) else 0
+        self.too_large = bool(max_size) and self.size > max_size
+        if self.too_large:
+            self.payload = None
+            self.error = f"Response of {self.size} bytes is over the {max_size} byte limit."
+        self.decoded = False
+        self._raw_response = None
+
+    @property
+    def raw_response(self):
+        if not self.decoded:
+            try:
+                self._raw_response = (
+                    pickle.loads(self.payload)
+                    if self.payload is not None else
+                    None)
+            except TypeError:
+                self._raw_response = None
+            self.payload = None
+            self.decoded = True
+        return self._raw_response
+
+    def _content_type_header(self):
+        # Needs the payload decoded, the headers are inside the pickle.
+        headers = getattr(self.raw_response, "headers", None)
+        if not headers or "Content-Type" not in headers:
+            return None
+        return headers["Content-Type"]
+
+    @property
+    def content_type(self):
+        # Media type of the page, e.g. "text/html", or None if unknown.
+        header = self._content_type_header()
+        if header is None:
+            return None
+        return header.split(";")[0].strip().lower()
+
+    @property
+    def charset(self):
+        # Charset the server declared in Content-Type, or None. Unlike
+        # raw_response.encoding this is never a guessed default.
+        header = self._content_type_header()
+        if header is None:
+            return None
+        for param in header.split(";")[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "charset" and value.strip(" \"'"):
+                return value.strip(" \"'")
+        return None
+
+    def is_html(self):
+        # Pages without a Content-Type are given the benefit of the doubt.
+        content_type = self.content_type
+        return content_type is None or content_type in HTML_TYPES
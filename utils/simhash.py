@@ -0,0 +1,25 @@
+from collections import Counter
+from functools import lru_cache
+from hashlib import blake2b
+import numpy as np
+
+@lru_cache(maxsize=1 << 18)
+def token_hash(token):
+    # Stable 64 bit token hash. Python's hash() is salted per process, which
+    # would make fingerprints differ between runs and between processes.
+    return int.from_bytes(
+        blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+def compute_simhash(words):
+    # words is a list of tokens or a mapping of token -> count. Every unique
+    # token is hashed once and votes with its term frequency as weight.
+    counts = words if isinstance(words, dict) else Counter(words)
+    hashes = np.fromiter(
+        (token_hash(word) for word in counts), dtype="<u8", count=len(counts))
+    weights = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    # One row per token, column i holds bit i of the token hash.
+    bits = np.unpackbits(
+        hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = 2 * (weights @ bits) - weights.sum()
+    packed = np.packbits(votes >= 0, bitorder="little")
+    return int.from_bytes(packed.tobytes(), "little")
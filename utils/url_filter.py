@@ -0,0 +1,87 @@
+import re
+from collections import Counter
+from urllib.parse import urlparse
+
+class UrlFilter(object):
+    # Compiles declarative crawl rules once so checking a url is a handful of
+    # dict and set lookups plus a few precompiled regex matches:
+    #   domains: (domain, include_subdomains, path_prefix) tuples, stored in
+    #       a trie keyed by domain labels from the right.
+    #   query_traps, path_traps: substrings that reject a url when found in
+    #       its query or path, compiled into a single alternation each.
+    #   extensions: file extensions, matched as a set lookup on the suffix of
+    #       the lowercased path.
+    #   max_length: longest accepted url.
+    #   max_segment_repeats: how often one path segment may appear.
+    RULE = object()
+    # Plain ascii http(s) urls without params, whitespace, control characters
+    # or ipv6 hosts split the same way as urlparse; anything else falls back
+    # to urlparse.
+    SIMPLE_URL = re.compile(
+        r"(https?)://([^/?#;\[\]\x00-\x20\x7f]*)([^?#;\x00-\x20\x7f]*)"
+        r"(?:\?([^#\x00-\x20\x7f]*))?(?:#[^\x00-\x20\x7f]*)?")
+
+    def __init__(self, domains, query_traps, path_traps, extensions,
+                 max_length, max_segment_repeats):
+        self.domains = {}
+        for domain, include_subdomains, path_prefix in domains:
+            node = self.domains
+            for label in reversed(domain.lower().split(".")):
+                node = node.setdefault(label, {})
+            node[self.RULE] = (include_subdomains, path_prefix)
+        self.query_traps = self._compile(query_traps)
+        self.path_traps = self._compile(path_traps)
+        self.extensions = frozenset(ext.lower() for ext in extensions)
+        self.max_length = max_length
+        self.max_segment_repeats = max_segment_repeats
+
+    def accepts(self, url):
+        match = self.SIMPLE_URL.fullmatch(url) if url.isascii() else None
+        if match:
+            scheme, netloc, raw_path, query = match.groups("")
+        else:
+            parsed = urlparse(url)
+            scheme, netloc, raw_path, query = (
+                parsed.scheme, parsed.netloc, parsed.path, parsed.query)
+        if scheme not in ("http", "https"):
+            return False
+        if len(url) > self.max_length:
+            return False
+        path = raw_path.lower()
+        if not self._allowed_domain(netloc.lower(), path):
+            return False
+        _, dot, extension = path.rpartition(".")
+        if dot and extension in self.extensions:
+            return False
+        if self.query_traps and self.query_traps.search(query):
+            return False
+        if self.path_traps and self.path_traps.search(raw_path):
+            return False
+        segments = raw_path.split("/")
+        # Counting is only needed if some segment appears more than once.
+        if len(set(segments)) < len(segments):
+            segment_counts = Counter(segments)
+            if max(segment_counts.values()) > self.max_segment_repeats:
+                return False
+        return True
+
+    def _allowed_domain(self, domain, path):
+        labels = domain.split(".")
+        node = self.domains
+        for depth in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[depth])
+            if node is None:
+                return False
+            rule = node.get(self.RULE)
+            if rule is not None:
+                include_subdomains, path_prefix = rule
+                if (depth == 0 or include_subdomains) and (
+                        path_prefix is None or path.startswith(path_prefix)):
+                    return True
+        return False
+
+    @staticmethod
+    def _compile(substrings):
+        if not substrings:
+            return None
+        return re.compile("|".join(re.escape(s) for s in substrings))